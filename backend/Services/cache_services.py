@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+   # Bounded, thread-safe in-process cache whose entries expire after ttl seconds
+   # Oldest entries are evicted first when maxsize is reached
+
+   def __init__(self, maxsize=1024, ttl=30):
+      self.maxsize = maxsize
+      self.ttl = ttl
+      self._entries = OrderedDict()
+      self._lock = threading.Lock()
+
+   def get(self, key, default=None):
+      with self._lock:
+         entry = self._entries.get(key)
+         if entry is None:
+            return default
+
+         value, expires_at = entry
+         if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+
+         return value
+
+   def set(self, key, value):
+      with self._lock:
+         self._entries.pop(key, None)
+         self._entries[key] = (value, time.monotonic() + self.ttl)
+
+         while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+   def clear(self):
+      with self._lock:
+         self._entries.clear()
+
+
+class LRUCache:
+   # Bounded, thread-safe in-process cache evicting least recently used entries
+   # Counts hits and misses
+
+   def __init__(self, maxsize=1024):
+      self.maxsize = maxsize
+      self.hits = 0
+      self.misses = 0
+      self._entries = OrderedDict()
+      self._lock = threading.Lock()
+
+   def get(self, key, default=None):
+      with self._lock:
+         if key not in self._entries:
+            self.misses += 1
+            return default
+
+         self._entries.move_to_end(key)
+         self.hits += 1
+         return self._entries[key]
+
+   def set(self, key, value):
+      with self._lock:
+         self._entries[key] = value
+         self._entries.move_to_end(key)
+
+         while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+   def delete(self, key):
+      with self._lock:
+         self._entries.pop(key, None)
+
+   def clear(self):
+      with self._lock:
+         self._entries.clear()
+
+   def stats(self):
+      with self._lock:
+         requests = self.hits + self.misses
+         return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0
+         }
@@ -0,0 +1,66 @@
+# Generated by scripts/generate_country_codes.py from pycountry 24.6.1, do not edit
+
+# ISO 3166-1 alpha-3 to alpha-2
+ALPHA3_TO_ALPHA2 = {
+   'ABW': 'AW', 'AFG': 'AF', 'AGO': 'AO', 'AIA': 'AI', 'ALA': 'AX', 'ALB': 'AL', 'AND': 'AD', 'ARE': 'AE',
+   'ARG': 'AR', 'ARM': 'AM', 'ASM': 'AS', 'ATA': 'AQ', 'ATF': 'TF', 'ATG': 'AG', 'AUS': 'AU', 'AUT': 'AT',
+   'AZE': 'AZ', 'BDI': 'BI', 'BEL': 'BE', 'BEN': 'BJ', 'BES': 'BQ', 'BFA': 'BF', 'BGD': 'BD', 'BGR': 'BG',
+   'BHR': 'BH', 'BHS': 'BS', 'BIH': 'BA', 'BLM': 'BL', 'BLR': 'BY', 'BLZ': 'BZ', 'BMU': 'BM', 'BOL': 'BO',
+   'BRA': 'BR', 'BRB': 'BB', 'BRN': 'BN', 'BTN': 'BT', 'BVT': 'BV', 'BWA': 'BW', 'CAF': 'CF', 'CAN': 'CA',
+   'CCK': 'CC', 'CHE': 'CH', 'CHL': 'CL', 'CHN': 'CN', 'CIV': 'CI', 'CMR': 'CM', 'COD': 'CD', 'COG': 'CG',
+   'COK': 'CK', 'COL': 'CO', 'COM': 'KM', 'CPV': 'CV', 'CRI': 'CR', 'CUB': 'CU', 'CUW': 'CW', 'CXR': 'CX',
+   'CYM': 'KY', 'CYP': 'CY', 'CZE': 'CZ', 'DEU': 'DE', 'DJI': 'DJ', 'DMA': 'DM', 'DNK': 'DK', 'DOM': 'DO',
+   'DZA': 'DZ', 'ECU': 'EC', 'EGY': 'EG', 'ERI': 'ER', 'ESH': 'EH', 'ESP': 'ES', 'EST': 'EE', 'ETH': 'ET',
+   'FIN': 'FI', 'FJI': 'FJ', 'FLK': 'FK', 'FRA': 'FR', 'FRO': 'FO', 'FSM': 'FM', 'GAB': 'GA', 'GBR': 'GB',
+   'GEO': 'GE', 'GGY': 'GG', 'GHA': 'GH', 'GIB': 'GI', 'GIN': 'GN', 'GLP': 'GP', 'GMB': 'GM', 'GNB': 'GW',
+   'GNQ': 'GQ', 'GRC': 'GR', 'GRD': 'GD', 'GRL': 'GL', 'GTM': 'GT', 'GUF': 'GF', 'GUM': 'GU', 'GUY': 'GY',
+   'HKG': 'HK', 'HMD': 'HM', 'HND': 'HN', 'HRV': 'HR', 'HTI': 'HT', 'HUN': 'HU', 'IDN': 'ID', 'IMN': 'IM',
+   'IND': 'IN', 'IOT': 'IO', 'IRL': 'IE', 'IRN': 'IR', 'IRQ': 'IQ', 'ISL': 'IS', 'ISR': 'IL', 'ITA': 'IT',
+   'JAM': 'JM', 'JEY': 'JE', 'JOR': 'JO', 'JPN': 'JP', 'KAZ': 'KZ', 'KEN': 'KE', 'KGZ': 'KG', 'KHM': 'KH',
+   'KIR': 'KI', 'KNA': 'KN', 'KOR': 'KR', 'KWT': 'KW', 'LAO': 'LA', 'LBN': 'LB', 'LBR': 'LR', 'LBY': 'LY',
+   'LCA': 'LC', 'LIE': 'LI', 'LKA': 'LK', 'LSO': 'LS', 'LTU': 'LT', 'LUX': 'LU', 'LVA': 'LV', 'MAC': 'MO',
+   'MAF': 'MF', 'MAR': 'MA', 'MCO': 'MC', 'MDA': 'MD', 'MDG': 'MG', 'MDV': 'MV', 'MEX': 'MX', 'MHL': 'MH',
+   'MKD': 'MK', 'MLI': 'ML', 'MLT': 'MT', 'MMR': 'MM', 'MNE': 'ME', 'MNG': 'MN', 'MNP': 'MP', 'MOZ': 'MZ',
+   'MRT': 'MR', 'MSR': 'MS', 'MTQ': 'MQ', 'MUS': 'MU', 'MWI': 'MW', 'MYS': 'MY', 'MYT': 'YT', 'NAM': 'NA',
+   'NCL': 'NC', 'NER': 'NE', 'NFK': 'NF', 'NGA': 'NG', 'NIC': 'NI', 'NIU': 'NU', 'NLD': 'NL', 'NOR': 'NO',
+   'NPL': 'NP', 'NRU': 'NR', 'NZL': 'NZ', 'OMN': 'OM', 'PAK': 'PK', 'PAN': 'PA', 'PCN': 'PN', 'PER': 'PE',
+   'PHL': 'PH', 'PLW': 'PW', 'PNG': 'PG', 'POL': 'PL', 'PRI': 'PR', 'PRK': 'KP', 'PRT': 'PT', 'PRY': 'PY',
+   'PSE': 'PS', 'PYF': 'PF', 'QAT': 'QA', 'REU': 'RE', 'ROU': 'RO', 'RUS': 'RU', 'RWA': 'RW', 'SAU': 'SA',
+   'SDN': 'SD', 'SEN': 'SN', 'SGP': 'SG', 'SGS': 'GS', 'SHN': 'SH', 'SJM': 'SJ', 'SLB': 'SB', 'SLE': 'SL',
+   'SLV': 'SV', 'SMR': 'SM', 'SOM': 'SO', 'SPM': 'PM', 'SRB': 'RS', 'SSD': 'SS', 'STP': 'ST', 'SUR': 'SR',
+   'SVK': 'SK', 'SVN': 'SI', 'SWE': 'SE', 'SWZ': 'SZ', 'SXM': 'SX', 'SYC': 'SC', 'SYR': 'SY', 'TCA': 'TC',
+   'TCD': 'TD', 'TGO': 'TG', 'THA': 'TH', 'TJK': 'TJ', 'TKL': 'TK', 'TKM': 'TM', 'TLS': 'TL', 'TON': 'TO',
+   'TTO': 'TT', 'TUN': 'TN', 'TUR': 'TR', 'TUV': 'TV', 'TWN': 'TW', 'TZA': 'TZ', 'UGA': 'UG', 'UKR': 'UA',
+   'UMI': 'UM', 'URY': 'UY', 'USA': 'US', 'UZB': 'UZ', 'VAT': 'VA', 'VCT': 'VC', 'VEN': 'VE', 'VGB': 'VG',
+   'VIR': 'VI', 'VNM': 'VN', 'VUT': 'VU', 'WLF': 'WF', 'WSM': 'WS', 'YEM': 'YE', 'ZAF': 'ZA', 'ZMB': 'ZM',
+   'ZWE': 'ZW'
+}
+
+# IOC codes differing from ISO alpha-3 (as used in ATP data) to ISO alpha-2
+IOC_TO_ALPHA2 = {
+   'ALG': 'DZ', 'ANG': 'AO', 'ANT': 'AG', 'ARU': 'AW', 'BAH': 'BS', 'BAN': 'BD', 'BAR': 'BB', 'BER': 'BM',
+   'BHU': 'BT', 'BIZ': 'BZ', 'BOT': 'BW', 'BRU': 'BN', 'BUL': 'BG', 'BUR': 'BF', 'CAM': 'KH', 'CAY': 'KY',
+   'CGO': 'CG', 'CHA': 'TD', 'CHI': 'CL', 'CRC': 'CR', 'CRO': 'HR', 'DEN': 'DK', 'ESA': 'SV', 'FIJ': 'FJ',
+   'GAM': 'GM', 'GEQ': 'GQ', 'GER': 'DE', 'GRE': 'GR', 'GRN': 'GD', 'GUA': 'GT', 'GUI': 'GN', 'HAI': 'HT',
+   'HON': 'HN', 'INA': 'ID', 'IRI': 'IR', 'ISV': 'VI', 'IVB': 'VG', 'KSA': 'SA', 'KUW': 'KW', 'LAT': 'LV',
+   'LBA': 'LY', 'LES': 'LS', 'LIB': 'LB', 'MAD': 'MG', 'MAS': 'MY', 'MAW': 'MW', 'MGL': 'MN', 'MON': 'MC',
+   'MRI': 'MU', 'MTN': 'MR', 'MYA': 'MM', 'NCA': 'NI', 'NED': 'NL', 'NEP': 'NP', 'NGR': 'NG', 'NIG': 'NE',
+   'OMA': 'OM', 'PAR': 'PY', 'PHI': 'PH', 'PLE': 'PS', 'POR': 'PT', 'PUR': 'PR', 'RSA': 'ZA', 'SAM': 'WS',
+   'SEY': 'SC', 'SIN': 'SG', 'SKN': 'KN', 'SLO': 'SI', 'SOL': 'SB', 'SRI': 'LK', 'SUD': 'SD', 'SUI': 'CH',
+   'TAN': 'TZ', 'TGA': 'TO', 'TOG': 'TG', 'TPE': 'TW', 'UAE': 'AE', 'URU': 'UY', 'VAN': 'VU', 'VIE': 'VN',
+   'VIN': 'VC', 'ZAM': 'ZM', 'ZIM': 'ZW'
+}
+
+
+def to_alpha2(code):
+   # ISO alpha-2, ISO alpha-3 or IOC code, in any case, to lowercase alpha-2
+   # Two-letter codes are kept as they are, including user-assigned ones
+   # returned by Wikidata (e.g. XK for Kosovo)
+   # Returns None when code is unknown
+   if not code:
+      return None
+   code = code.strip().upper()
+   if len(code) == 2:
+      return code.lower() if code.isascii() and code.isalpha() else None
+   alpha2 = IOC_TO_ALPHA2.get(code) or ALPHA3_TO_ALPHA2.get(code)
+   return alpha2.lower() if alpha2 else None
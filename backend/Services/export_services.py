@@ -0,0 +1,195 @@
+import os
+
+# Exports of rankings and players tables to Parquet or Arrow IPC for analytics
+# pyarrow is optional, only needed by exports: pip install pyarrow
+# Columns are built from SQL results without ORM objects or per-row dicts,
+# dates are read as days since epoch and viewed as date32 without conversion
+
+EXPORT_FORMATS = {
+   'parquet': {'extension': 'parquet', 'mimetype': 'application/vnd.apache.parquet'},
+   'arrow': {'extension': 'arrow', 'mimetype': 'application/vnd.apache.arrow.stream'}
+}
+
+# Days since 1970-01-01 of a SQLite date
+EPOCH_DAYS = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+RANKINGS_YEAR_SELECT = f"""
+   SELECT player_id, {EPOCH_DAYS.format(column='ranking_date')}, points, rank
+   FROM rankings
+   WHERE ranking_date >= ? AND ranking_date < ?
+   ORDER BY ranking_date, rank
+"""
+
+PLAYERS_SELECT = f"""
+   SELECT player_id, name_first, name_last, hand,
+          {EPOCH_DAYS.format(column='birth_date')},
+          country, height, wikidata_id, fullname,
+          best_rank, {EPOCH_DAYS.format(column='best_rank_date')}, weeks_at_best
+   FROM players
+   ORDER BY player_id
+"""
+
+
+def import_pyarrow():
+
+   # Raises RuntimeError when pyarrow is not installed
+   try:
+      import pyarrow
+      import pyarrow.ipc
+      import pyarrow.parquet
+   except ImportError:
+      raise RuntimeError('Exports need pyarrow, install it with: pip install pyarrow')
+   return pyarrow
+
+
+def rankings_schema(pa):
+   return pa.schema([
+      ('player_id', pa.string()),
+      ('ranking_date', pa.date32()),
+      ('points', pa.int32()),
+      ('rank', pa.int32())
+   ])
+
+
+def players_schema(pa):
+   return pa.schema([
+      ('player_id', pa.string()),
+      ('name_first', pa.string()),
+      ('name_last', pa.string()),
+      ('hand', pa.string()),
+      ('birth_date', pa.date32()),
+      ('country', pa.string()),
+      ('height', pa.string()),
+      ('wikidata_id', pa.string()),
+      ('fullname', pa.string()),
+      ('best_rank', pa.int32()),
+      ('best_rank_date', pa.date32()),
+      ('weeks_at_best', pa.int32())
+   ])
+
+
+def _table_from_rows(pa, schema, rows):
+
+   # One column at a time, date columns are int32 days viewed as date32
+   columns = list(zip(*rows)) if rows else [()] * len(schema)
+   arrays = []
+   for field, values in zip(schema, columns):
+      if field.type == pa.date32():
+         arrays.append(pa.array(values, pa.int32()).view(pa.date32()))
+      else:
+         arrays.append(pa.array(values, field.type))
+   return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_rankings_tables(connection):
+
+   # Rankings table year by year, on ranking_date index
+   # connection: SQLAlchemy connection
+   pa = import_pyarrow()
+   schema = rankings_schema(pa)
+
+   first_date, last_date = connection.exec_driver_sql(
+      'SELECT MIN(ranking_date), MAX(ranking_date) FROM rankings'
+   ).one()
+   if first_date is None:
+      return
+
+   for year in range(int(str(first_date)[:4]), int(str(last_date)[:4]) + 1):
+      rows = connection.exec_driver_sql(
+         RANKINGS_YEAR_SELECT, (f'{year:04d}-01-01', f'{year + 1:04d}-01-01')
+      ).all()
+      if rows:
+         yield _table_from_rows(pa, schema, rows)
+
+
+def players_table(connection):
+   pa = import_pyarrow()
+   rows = connection.exec_driver_sql(PLAYERS_SELECT).all()
+   return _table_from_rows(pa, players_schema(pa), rows)
+
+
+class _ChunksSink:
+   # Write-only file collecting written bytes, so they can be streamed as they come
+
+   def __init__(self):
+      self.chunks = []
+      self.position = 0
+      self.closed = False
+
+   def write(self, data):
+      data = bytes(data)
+      self.chunks.append(data)
+      self.position += len(data)
+      return len(data)
+
+   def tell(self):
+      return self.position
+
+   def flush(self):
+      pass
+
+   def close(self):
+      self.closed = True
+
+   def drain(self):
+      data = b''.join(self.chunks)
+      self.chunks = []
+      return data
+
+
+def _open_writer(pa, sink, schema, export_format, streaming=False):
+
+   # Parquet writes one row group by table written, i.e. one by year
+   if export_format == 'parquet':
+      return pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+   if streaming:
+      return pa.ipc.new_stream(sink, schema)
+   return pa.ipc.new_file(sink, schema)
+
+
+def write_tables(tables, schema, path, export_format):
+
+   # Writes tables into one file, returns rows written
+   pa = import_pyarrow()
+   total_rows = 0
+   with _open_writer(pa, path, schema, export_format) as writer:
+      for table in tables:
+         writer.write_table(table)
+         total_rows += table.num_rows
+   return total_rows
+
+
+def export_tables(connection, directory, export_format='parquet'):
+
+   # Writes rankings and players files into directory
+   # Returns {file path: rows written}
+   pa = import_pyarrow()
+   extension = EXPORT_FORMATS[export_format]['extension']
+   os.makedirs(directory, exist_ok=True)
+
+   rankings_path = os.path.join(directory, f'rankings.{extension}')
+   players_path = os.path.join(directory, f'players.{extension}')
+   return {
+      rankings_path: write_tables(
+         iter_rankings_tables(connection), rankings_schema(pa), rankings_path, export_format
+      ),
+      players_path: write_tables(
+         [players_table(connection)], players_schema(pa), players_path, export_format
+      )
+   }
+
+
+def stream_rankings(connection, export_format='parquet'):
+
+   # Yields bytes of rankings file, one year at a time
+   # Arrow is sent in IPC stream format, which needs no seeking
+   pa = import_pyarrow()
+   sink = _ChunksSink()
+   writer = _open_writer(pa, sink, rankings_schema(pa), export_format, streaming=True)
+
+   for table in iter_rankings_tables(connection):
+      writer.write_table(table)
+      yield sink.drain()
+
+   writer.close()
+   yield sink.drain()
@@ -0,0 +1,149 @@
+import csv
+import os
+from datetime import date
+from itertools import islice
+
+# Columns of weekly ATP rankings files (e.g. atp_rankings_90s.csv)
+RANKING_COLUMNS = ['ranking_date', 'rank', 'player', 'points']
+
+
+def ranking_files(paths):
+
+   # Expands directories into their CSV files, in name order
+   files = []
+   for path in paths:
+      if os.path.isdir(path):
+         files.extend(sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith('.csv')
+         ))
+      else:
+         files.append(path)
+   return files
+
+
+def normalize_ranking_date(value):
+
+   # '20240101' or '2024-01-01' to ISO format, as stored in database
+   value = value.strip()
+   if len(value) == 8 and value.isdigit():
+      return f'{value[:4]}-{value[4:6]}-{value[6:]}'
+   return date.fromisoformat(value).isoformat()
+
+
+def parse_points(value):
+
+   # Points as integer, None when unknown ('unknown', '' or any text)
+   # Same rule as POINTS_AS_INTEGER of main.py: only integer numbers are kept
+   value = value.strip()
+   try:
+      points = int(value)
+   except ValueError:
+      return None
+   return points if str(points) == value else None
+
+
+def iter_ranking_rows(path, since=None):
+
+   # Streams rows of a rankings CSV file as (player_id, ranking_date, points, rank)
+   # without loading the file into memory. Header line is optional
+   # Points are None when unknown
+   # since: ISO date, rows of this week or older are skipped
+   with open(path, newline='', encoding='utf-8') as ranking_file:
+      reader = csv.reader(ranking_file)
+
+      first_row = next(reader, None)
+      if first_row is None:
+         return
+
+      # Column positions from header, or default order
+      if first_row and not first_row[0].strip().isdigit():
+         header = [column.strip().lower() for column in first_row]
+         try:
+            positions = [header.index(column) for column in RANKING_COLUMNS]
+         except ValueError:
+            raise ValueError(f'{path}: expected columns {", ".join(RANKING_COLUMNS)}, found {", ".join(header)}')
+         rows = reader
+         first_line = 2
+      else:
+         positions = list(range(len(RANKING_COLUMNS)))
+         rows = _chain_first(first_row, reader)
+         first_line = 1
+
+      date_position, rank_position, player_position, points_position = positions
+      for line_number, row in enumerate(rows, start=first_line):
+         if not row:
+            continue
+         try:
+            ranking_date = normalize_ranking_date(row[date_position])
+            if since is not None and ranking_date <= since:
+               continue
+            
+            yield (
+               row[player_position].strip(),
+               ranking_date,
+               parse_points(row[points_position]) if len(row) > points_position else None,
+               int(row[rank_position])
+            )
+         except (IndexError, ValueError) as e:
+            print(f'RankingsServices Warning from iter_ranking_rows: {path} line {line_number} skipped - {e}')
+
+
+def _chain_first(first_row, reader):
+   yield first_row
+   yield from reader
+
+
+def batched(iterable, size):
+
+   # Splits an iterable into lists of size elements
+   iterator = iter(iterable)
+   while True:
+      batch = list(islice(iterator, size))
+      if not batch:
+         return
+      yield batch
+
+
+def lttb(points, threshold):
+
+   # Largest-Triangle-Three-Buckets: reduces a chart series to threshold points
+   # keeping its visual shape (peaks and drops), first and last points are kept
+   # points: list of (x, y) ordered by x, e.g. (date ordinal, rank)
+   # Returns list of indexes of points kept
+   total = len(points)
+   if threshold >= total or threshold < 3:
+      return list(range(total))
+
+   kept = [0]
+   bucket_size = (total - 2) / (threshold - 2)
+   previous = 0
+
+   for bucket in range(threshold - 2):
+      # Average point of next bucket
+      next_start = int((bucket + 1) * bucket_size) + 1
+      next_end = min(int((bucket + 2) * bucket_size) + 1, total)
+      next_points = points[next_start:next_end]
+      average_x = sum(x for x, _ in next_points) / len(next_points)
+      average_y = sum(y for _, y in next_points) / len(next_points)
+
+      # Point of current bucket making the largest triangle with previous kept point
+      start = int(bucket * bucket_size) + 1
+      end = int((bucket + 1) * bucket_size) + 1
+      previous_x, previous_y = points[previous]
+      largest_area = -1
+      for index in range(start, end):
+         x, y = points[index]
+         area = abs(
+            (previous_x - average_x) * (y - previous_y)
+            - (previous_x - x) * (average_y - previous_y)
+         )
+         if area > largest_area:
+            largest_area = area
+            selected = index
+
+      kept.append(selected)
+      previous = selected
+
+   kept.append(total - 1)
+   return kept
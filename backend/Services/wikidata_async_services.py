@@ -0,0 +1,126 @@
+import asyncio
+
+from Services.wikidata_services import get_wikidata_id, \
+                                       is_tennis_player, \
+                                       load_wikidata_entities, \
+                                       get_wikidata_country, \
+                                       get_wikidata_birth_date, \
+                                       get_wikidata_height, \
+                                       get_wikidata_weight, \
+                                       get_wikidata_hand, \
+                                       get_wikidata_networks, \
+                                       get_wikidata_pro_since
+
+# Asyncio variant of wikidata_services
+# Sync functions run in threads and share the pooled client, its cache and its limits,
+# so results are the same normalized values returned by wikidata_services
+
+async def async_get_wikidata_id(player_name, validate=True):
+   return await asyncio.to_thread(get_wikidata_id, player_name, validate)
+
+async def async_is_tennis_player(wikidata_id, entities=None):
+   return await asyncio.to_thread(is_tennis_player, wikidata_id, entities)
+
+async def async_load_wikidata_entities(wikidata_ids):
+   return await asyncio.to_thread(load_wikidata_entities, wikidata_ids)
+
+async def async_get_wikidata_country(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_country, wikidata_id, entities)
+
+async def async_get_wikidata_birth_date(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_birth_date, wikidata_id, entities)
+
+async def async_get_wikidata_height(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_height, wikidata_id, entities)
+
+async def async_get_wikidata_weight(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_weight, wikidata_id, entities)
+
+async def async_get_wikidata_hand(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_hand, wikidata_id, entities)
+
+async def async_get_wikidata_networks(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_networks, wikidata_id, entities)
+
+async def async_get_wikidata_pro_since(wikidata_id, entities=None):
+   return await asyncio.to_thread(get_wikidata_pro_since, wikidata_id, entities)
+
+
+async def enrich_players_async(players, concurrency=8):
+
+   # Searches missing values for a page of players concurrently
+   # players: list of dicts with 'player_id', 'player_name', 'wikidata_id' (None if unknown),
+   #          'needs_country' and 'needs_birth_date'
+   # Returns dict {player_id: values found}, values among 'wikidata_id', 'country',
+   # 'birth_date', or 'error' when the search of the player failed (e.g. Wikidata
+   # unreachable), so it is retried. Values absent from Wikidata are just not returned
+   semaphore = asyncio.Semaphore(concurrency)
+   results = {player['player_id']: {} for player in players}
+   # Ids found by name, kept once validated as tennis players from the batch claims
+   candidates = {}
+
+   async def limited(coroutine):
+      async with semaphore:
+         return await coroutine
+
+   async def search_id(player):
+      wikidata_id = await limited(async_get_wikidata_id(player['player_name'], validate=False))
+      if wikidata_id:
+         candidates[player['player_id']] = wikidata_id
+
+   async def search_values(player, wikidata_id, entities):
+      values = results[player['player_id']]
+      if player['player_id'] in candidates:
+         if not await limited(async_is_tennis_player(wikidata_id, entities)):
+            return
+         values['wikidata_id'] = wikidata_id
+
+      lookups = {}
+      if player.get('needs_country'):
+         lookups['country'] = limited(async_get_wikidata_country(wikidata_id, entities))
+      if player.get('needs_birth_date'):
+         lookups['birth_date'] = limited(async_get_wikidata_birth_date(wikidata_id, entities))
+
+      found = await asyncio.gather(*lookups.values())
+      for field, value in zip(lookups, found):
+         if value:
+            values[field] = value
+
+   async def run(step, player, *args):
+      # Keeps one player failure from stopping the others
+      try:
+         await step(player, *args)
+      except Exception as e:
+         print(f'WikidataAsyncServices Error in enrich_players_async: player {player["player_id"]} - {e}')
+         results[player['player_id']]['error'] = str(e)
+
+   # Searches missing wikidata ids concurrently, P31 is checked after the batch load
+   await asyncio.gather(*(
+      run(search_id, player) for player in players
+      if not player.get('wikidata_id') and player.get('player_name')
+   ))
+
+   # Loads claims of all players at once, P31 of candidates included
+   wikidata_ids = {
+      player['player_id']: player.get('wikidata_id') or candidates.get(player['player_id'])
+      for player in players
+   }
+   try:
+      entities = await async_load_wikidata_entities(
+         [wikidata_id for wikidata_id in wikidata_ids.values() if wikidata_id]
+      )
+   except Exception as e:
+      # Wikidata unreachable, the whole batch is retried
+      print(f'WikidataAsyncServices Error in enrich_players_async: batch not loaded - {e}')
+      for values in results.values():
+         values.setdefault('error', str(e))
+      return results
+
+   # Reads values concurrently, requesting only claims missing in batch
+   await asyncio.gather(*(
+      run(search_values, player, wikidata_ids[player['player_id']], entities)
+      for player in players
+      if wikidata_ids[player['player_id']] and 'error' not in results[player['player_id']]
+   ))
+
+   return results
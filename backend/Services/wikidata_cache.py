@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class ClaimsCache:
+   # Persistent cache of Wikidata claims keyed by (entity, property)
+   # Absent properties are stored as negative entries (claims NULL) with a shorter TTL
+   # Size is bounded, least recently used entries are evicted first
+
+   def __init__(self, path, ttl=30 * 24 * 3600, negative_ttl=24 * 3600, max_entries=100000):
+      self.path = path
+      self.ttl = ttl
+      self.negative_ttl = negative_ttl
+      self.max_entries = max_entries
+      self.hits = 0
+      self.misses = 0
+
+      # Connection shared between threads, serialized by lock
+      self._lock = threading.Lock()
+      self._writes_since_eviction = 0
+      self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+      self._connection.execute('PRAGMA journal_mode=WAL')
+      self._connection.execute('PRAGMA synchronous=NORMAL')
+      self._connection.execute('''
+         CREATE TABLE IF NOT EXISTS claims (
+            entity TEXT NOT NULL,
+            property TEXT NOT NULL,
+            claims TEXT,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (entity, property)
+         )
+      ''')
+      self._connection.execute(
+         'CREATE INDEX IF NOT EXISTS ix_claims_last_access ON claims (last_access)'
+      )
+
+   def get(self, entity, property):
+      # Returns (found, claims). claims is None for cached absent properties
+      now = time.time()
+      with self._lock:
+         row = self._connection.execute(
+            'SELECT claims, expires_at FROM claims WHERE entity = ? AND property = ?',
+            (entity, property)
+         ).fetchone()
+
+         # Missing or expired entry
+         if not row or row[1] <= now:
+            if row:
+               self._connection.execute(
+                  'DELETE FROM claims WHERE entity = ? AND property = ?',
+                  (entity, property)
+               )
+            self.misses += 1
+            return False, None
+
+         # Refreshes entry position in LRU order
+         self._connection.execute(
+            'UPDATE claims SET last_access = ? WHERE entity = ? AND property = ?',
+            (now, entity, property)
+         )
+         self.hits += 1
+
+      return True, (json.loads(row[0]) if row[0] is not None else None)
+
+   def set(self, entity, property, claims):
+      # Stores claims, or a negative entry when claims is None
+      now = time.time()
+      ttl = self.ttl if claims is not None else self.negative_ttl
+      value = json.dumps(claims) if claims is not None else None
+
+      with self._lock:
+         self._connection.execute(
+            'INSERT OR REPLACE INTO claims (entity, property, claims, expires_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (entity, property, value, now + ttl, now)
+         )
+
+         # Checks size from time to time, not on every write
+         self._writes_since_eviction += 1
+         if self._writes_since_eviction >= 100:
+            self._writes_since_eviction = 0
+            self._evict()
+
+   def _evict(self):
+      # Removes expired entries and least recently used ones over max_entries
+      self._connection.execute('DELETE FROM claims WHERE expires_at <= ?', (time.time(),))
+
+      size = self._connection.execute('SELECT COUNT(*) FROM claims').fetchone()[0]
+      if size > self.max_entries:
+         # Leaves some room so eviction does not run on every write
+         excess = size - int(self.max_entries * 0.9)
+         self._connection.execute(
+            'DELETE FROM claims WHERE rowid IN '
+            '(SELECT rowid FROM claims ORDER BY last_access LIMIT ?)',
+            (excess,)
+         )
+
+   def clear(self):
+      with self._lock:
+         self._connection.execute('DELETE FROM claims')
+         self.hits = 0
+         self.misses = 0
+
+   def hit_rate(self):
+      total = self.hits + self.misses
+      return self.hits / total if total else 0.0
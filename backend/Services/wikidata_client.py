@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+WIKIDATA_API_URL = 'https://www.wikidata.org/w/api.php'
+
+# Wikimedia asks clients to identify themselves
+USER_AGENT = 'TennisAnalytics/1.0 (https://github.com/TereGranero/tennis-annalytics) python-requests'
+
+
+class RateLimiter:
+   # Token bucket shared by all threads of the process
+
+   def __init__(self, rate, burst=None):
+      self.rate = rate
+      self.capacity = burst or max(1, int(rate))
+      self._tokens = self.capacity
+      self._updated_at = time.monotonic()
+      self._lock = threading.Lock()
+
+   def acquire(self):
+      # Blocks until a request is allowed
+      while True:
+         with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            if self._tokens >= 1:
+               self._tokens -= 1
+               return
+
+            wait = (1 - self._tokens) / self.rate
+
+         time.sleep(wait)
+
+
+class WikidataClient:
+   # Shared client for Wikidata API
+   # Keeps connections alive in a pool, bounds concurrent requests, limits request rate
+   # and retries throttled (429, maxlag), server (5XX) and connection errors with backoff
+
+   def __init__(self, max_connections=8, requests_per_second=5, max_retries=5,
+                backoff_factor=1, max_backoff=60, maxlag=5, timeout=10):
+      self.max_retries = max_retries
+      self.backoff_factor = backoff_factor
+      self.max_backoff = max_backoff
+      self.maxlag = maxlag
+      self.timeout = timeout
+
+      # Keep-alive connection pool
+      self.session = requests.Session()
+      self.session.headers.update({'User-Agent': USER_AGENT})
+      adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True)
+      self.session.mount('https://', adapter)
+
+      self._semaphore = threading.BoundedSemaphore(max_connections)
+      self.rate_limiter = RateLimiter(requests_per_second)
+
+      # Statistics
+      self._stats_lock = threading.Lock()
+      self.requests_count = 0
+      self.retries_count = 0
+
+   def get(self, params):
+      # Requests Wikidata API and returns decoded JSON
+      # Raises HTTPError or RequestException when retries are exhausted
+      params = dict(params, maxlag=self.maxlag)
+
+      for attempt in range(self.max_retries + 1):
+         last_attempt = attempt == self.max_retries
+         self.rate_limiter.acquire()
+
+         try:
+            with self._semaphore:
+               res = self.session.get(WIKIDATA_API_URL, params=params, timeout=self.timeout)
+            self._count('requests_count')
+
+         except (ConnectionError, Timeout):
+            if last_attempt:
+               raise
+            self._wait(attempt)
+            continue
+
+         # Throttled or server error
+         if res.status_code == 429 or res.status_code >= 500:
+            if last_attempt:
+               res.raise_for_status()
+            self._wait(attempt, res)
+            continue
+
+         # Raises HTTPError when response status is 4XX
+         res.raise_for_status()
+         data = res.json()
+
+         # Replication lag too high, Wikidata asks to come back later
+         if data.get('error', {}).get('code') == 'maxlag':
+            if last_attempt:
+               raise HTTPError(f"Wikidata maxlag: {data['error'].get('info')}", response=res)
+            self._wait(attempt, res)
+            continue
+
+         return data
+
+   def _wait(self, attempt, res=None):
+      # Sleeps as asked by Retry-After header, otherwise exponential backoff with jitter
+      self._count('retries_count')
+      delay = self._retry_after(res) if res is not None else None
+      if delay is None:
+         delay = self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_factor)
+      time.sleep(min(delay, self.max_backoff))
+
+   @staticmethod
+   def _retry_after(res):
+      # Retry-After in seconds or as HTTP date
+      value = res.headers.get('Retry-After')
+      if not value:
+         return None
+      try:
+         return max(0.0, float(value))
+      except ValueError:
+         pass
+      try:
+         return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+      except (TypeError, ValueError):
+         return None
+
+   def _count(self, counter):
+      with self._stats_lock:
+         setattr(self, counter, getattr(self, counter) + 1)
@@ -1,6 +1,54 @@
-import requests
 from requests.exceptions import HTTPError, RequestException
 from datetime import datetime
+import os
+
+from Services.wikidata_cache import ClaimsCache
+from Services.wikidata_client import WikidataClient
+
+# Getters return None when Wikidata has no value, and raise RequestException (HTTPError
+# included) when Wikidata cannot be reached after retries, so callers retry them later
+
+# Properties read by getters
+PLAYER_PROPERTIES = ['P31', 'P27', 'P569', 'P2048', 'P2067', 'P552', 'P2003', 'P2013', 'P2002', 'P2031']
+COUNTRY_PROPERTIES = ['P297']
+
+# Maximum ids per wbgetentities request
+WBGETENTITIES_MAX_IDS = 50
+
+# Persistent claims cache and shared HTTP client, created on first use
+claims_cache = None
+wikidata_client = None
+
+def configure_claims_cache(path=None, ttl=30 * 24 * 3600, negative_ttl=24 * 3600, max_entries=100000):
+   # Sets up claims cache. Called by the app with its configuration
+   global claims_cache
+   claims_cache = ClaimsCache(
+      path or os.path.abspath('wikidata_cache.sqlite'),
+      ttl=ttl,
+      negative_ttl=negative_ttl,
+      max_entries=max_entries
+   )
+   return claims_cache
+
+
+def get_claims_cache():
+   if claims_cache is None:
+      configure_claims_cache()
+   return claims_cache
+
+
+def configure_wikidata_client(**kwargs):
+   # Sets up shared Wikidata client. Called by the app with its configuration
+   global wikidata_client
+   wikidata_client = WikidataClient(**kwargs)
+   return wikidata_client
+
+
+def get_wikidata_client():
+   if wikidata_client is None:
+      configure_wikidata_client()
+   return wikidata_client
+
 
 def get_wikidata_property(wikidata_id, property):
    
@@ -11,8 +59,12 @@ def get_wikidata_property(wikidata_id, property):
          print(f'WikidataServices Error in get_property: empty {argument}')
          return None
    
+   # Cached claims, including properties known to be absent
+   found, cached_claims = get_claims_cache().get(wikidata_id, property)
+   if found:
+      return cached_claims
+   
    # Connection parameters
-   wiki_api_url = 'https://www.wikidata.org/w/api.php'
    params = {
       'action': 'wbgetclaims',
       'format': 'json',
@@ -22,38 +74,117 @@ def get_wikidata_property(wikidata_id, property):
    
    try:
       
-      # Requests Wikidata API
-      res = requests.get(
-         wiki_api_url, 
-         params=params, 
-         timeout=10
-      )
-      
-      # Raises HTTPError when response status is 4XX or 5XX
-      res.raise_for_status()
-      
-      data = res.json()
+      # Requests Wikidata API through shared client
+      # Raises HTTPError or RequestException when retries are exhausted
+      data = get_wikidata_client().get(params)
       
-      # Empty response
+      # Empty response, cached as negative entry
       if not property in data.get('claims', {}): 
          print(f'WikidataServices Warning from get_property: Property {property} does not exist for wikidata id {wikidata_id}')   
+         get_claims_cache().set(wikidata_id, property, None)
          return None
       
       # Extracts property array
+      get_claims_cache().set(wikidata_id, property, data['claims'][property])
       return data['claims'][property]
       
    except HTTPError as e:
       print(f'WikidataServices Error in get_wikidata_property: HTTPError - {e}')
-      return None
+      raise
    except RequestException as e:
       print(f'WikidataServices Error in get_wikidata_property: HTTP Request Error - {e}')
-      return None
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_property: {e}')
       return None
 
 
-def is_tennis_player(wikidata_id):
+def get_wikidata_entities(wikidata_ids, properties):
+   
+   # Loads claims of several entities with one wbgetentities call per 50 ids
+   # Returns dict {wikidata_id: {property: claims or None}}
+   entities = {}
+   
+   # Entities with all properties cached are not requested
+   ids_to_request = []
+   for wikidata_id in dict.fromkeys(id for id in wikidata_ids if id):
+      cached_entity = {}
+      for property in properties:
+         found, claims = get_claims_cache().get(wikidata_id, property)
+         if not found:
+            ids_to_request.append(wikidata_id)
+            break
+         cached_entity[property] = claims
+      else:
+         entities[wikidata_id] = cached_entity
+   
+   for start in range(0, len(ids_to_request), WBGETENTITIES_MAX_IDS):
+      ids_chunk = ids_to_request[start:start + WBGETENTITIES_MAX_IDS]
+      params = {
+         'action': 'wbgetentities',
+         'format': 'json',
+         'ids': '|'.join(ids_chunk),
+         'props': 'claims'
+      }
+      
+      try:
+         # Requests Wikidata API through shared client
+         # Raises HTTPError or RequestException when retries are exhausted
+         data = get_wikidata_client().get(params)
+         
+         # Entities are keyed by requested id, also when redirected
+         for entity_id, entity in data.get('entities', {}).items():
+            
+            # Unknown entity, all properties absent
+            if 'missing' in entity:
+               print(f'WikidataServices Warning from get_wikidata_entities: wikidata id {entity_id} does not exist')
+            
+            # Keeps only requested properties, absent ones as None
+            claims = entity.get('claims') or {}
+            entities[entity_id] = {property: claims.get(property) for property in properties}
+            for property, property_claims in entities[entity_id].items():
+               get_claims_cache().set(entity_id, property, property_claims)
+      
+      # Wikidata unreachable, the whole batch is retried later
+      except HTTPError as e:
+         print(f'WikidataServices Error in get_wikidata_entities: HTTPError - {e}')
+         raise
+      except RequestException as e:
+         print(f'WikidataServices Error in get_wikidata_entities: HTTP Request Error - {e}')
+         raise
+      # Entities not loaded are requested one by one by getters
+      except Exception as e:
+         print(f'WikidataServices Error in get_wikidata_entities: {e}')
+   
+   return entities
+
+
+def load_wikidata_entities(wikidata_ids):
+   
+   # Loads in batch the players claims read by getters and their countries claims
+   entities = get_wikidata_entities(wikidata_ids, PLAYER_PROPERTIES)
+   
+   country_ids = []
+   for entity in entities.values():
+      try:
+         country_ids.append(entity['P27'][0]['mainsnak']['datavalue']['value']['id'])
+      except (KeyError, IndexError, TypeError):
+         continue
+   
+   entities.update(get_wikidata_entities(country_ids, COUNTRY_PROPERTIES))
+   return entities
+
+
+def get_entity_claims(wikidata_id, property, entities=None):
+   
+   # Reads claims from entities loaded in batch, otherwise requests Wikidata API
+   if entities and property in entities.get(wikidata_id, {}):
+      return entities[wikidata_id][property]
+   
+   return get_wikidata_property(wikidata_id, property)
+
+
+def is_tennis_player(wikidata_id, entities=None):
    
    try:
       # Validates argument
@@ -62,7 +193,7 @@ def is_tennis_player(wikidata_id):
          return None
       
       # Requests Wikidata API
-      jobs_claim = get_wikidata_property(wikidata_id, 'P31')
+      jobs_claim = get_entity_claims(wikidata_id, 'P31', entities)
       
       # Empty response
       if not jobs_claim or len(jobs_claim) == 0:
@@ -84,6 +215,9 @@ def is_tennis_player(wikidata_id):
          print(f'WikidataServices Info from is_tennis_player: wikidata_id {wikidata_id} has been validated as a tennis player.')
          return True
       
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in is_tennis_player: {str(e)}')
       return False
@@ -91,16 +225,17 @@ def is_tennis_player(wikidata_id):
 
 
 
-def get_wikidata_id(player_name):
+def get_wikidata_id(player_name, validate=True):
    
+   # validate: checks the id is a tennis player (P31) with one more request
+   # False when the caller checks it with is_tennis_player on entities loaded in batch
 
    # Validates argument
    if not player_name.strip():
       print('WikidataServices Error in get_wikidata_id: empty player name.')
       return None
 
-   # Connection parameters            
-   wiki_api_url = f'https://www.wikidata.org/w/api.php'
+   # Connection parameters
    params = {
       'action': 'wbsearchentities',
       'format': 'json',
@@ -112,17 +247,9 @@ def get_wikidata_id(player_name):
    }
 
    try: 
-      # Requests Wikidata API
-      res = requests.get(
-         wiki_api_url, 
-         params=params, 
-         timeout=10
-      )
-      
-      # Raises HTTPError when response status is 4XX or 5XX
-      res.raise_for_status()
-      
-      data = res.json()
+      # Requests Wikidata API through shared client
+      # Raises HTTPError or RequestException when retries are exhausted
+      data = get_wikidata_client().get(params)
       
       # Empty response
       if not data.get('search'):
@@ -132,7 +259,7 @@ def get_wikidata_id(player_name):
       wikidata_id = data['search'][0]['id']
       
       # Empty response or not validated tennis player
-      if not wikidata_id or not is_tennis_player(wikidata_id):
+      if not wikidata_id or (validate and not is_tennis_player(wikidata_id)):
          print(f'WikidataServices Warning from get_wikidata_id: No wikidata id has been found for player {player_name}')
          return None
       
@@ -142,17 +269,17 @@ def get_wikidata_id(player_name):
    
    except HTTPError as e:
       print(f'WikidataServices Error in get_wikidata_id: HTTPError - {e}')
-      return None
+      raise
    except RequestException as e:
       print(f'WikidataServices Error in get_wikidata_id: HTTP Request Error - {e}')
-      return None
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_id: {e}')
       return None
    
 
    
-def get_wikidata_country(wikidata_id):
+def get_wikidata_country(wikidata_id, entities=None):
    
    try:
       # Validates argument
@@ -161,7 +288,7 @@ def get_wikidata_country(wikidata_id):
          return None
 
       # Requests Wikidata API
-      country_claim = get_wikidata_property(wikidata_id, 'P27')
+      country_claim = get_entity_claims(wikidata_id, 'P27', entities)
 
       # Empty response
       if not country_claim or len(country_claim) == 0:
@@ -177,7 +304,7 @@ def get_wikidata_country(wikidata_id):
          return None
       
       # Requests Wikidata API for country ISO-3166-1 alpha-2
-      alpha2_claim = get_wikidata_property(country_id, 'P297')
+      alpha2_claim = get_entity_claims(country_id, 'P297', entities)
       
       # Empty response
       if not alpha2_claim or len(alpha2_claim) == 0:
@@ -196,12 +323,15 @@ def get_wikidata_country(wikidata_id):
       print(f'WikidataServices Info from get_wikidata_country: alpha2 code has been found for wikidata id {wikidata_id} country id {country_id}')
       return country_alpha2.lower()
 
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_country: {str(e)}')
       return None
    
 
-def get_wikidata_birth_date(wikidata_id):
+def get_wikidata_birth_date(wikidata_id, entities=None):
 
    try:
       # Validates argument
@@ -210,7 +340,7 @@ def get_wikidata_birth_date(wikidata_id):
          return None
 
       # Requests Wikidata API
-      birth_date_claim = get_wikidata_property(wikidata_id, 'P569')
+      birth_date_claim = get_entity_claims(wikidata_id, 'P569', entities)
 
       # Empty response
       if not birth_date_claim or len(birth_date_claim) == 0:
@@ -231,12 +361,15 @@ def get_wikidata_birth_date(wikidata_id):
       print(f'WikidataServices Info from get_wikidata_birth_date: birth date {formatted_birth_date} has been found for wikidata id {wikidata_id}')
       return formatted_birth_date
             
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_birth_date: {str(e)}')
       return None
    
 
-def get_wikidata_height(wikidata_id):
+def get_wikidata_height(wikidata_id, entities=None):
 
    try:
       # Validates argument 
@@ -245,7 +378,7 @@ def get_wikidata_height(wikidata_id):
          return None
 
       # Requests Wikidata API
-      height_claim = get_wikidata_property(wikidata_id, 'P2048')
+      height_claim = get_entity_claims(wikidata_id, 'P2048', entities)
 
       # Empty response
       if not height_claim or len(height_claim) == 0:
@@ -284,12 +417,15 @@ def get_wikidata_height(wikidata_id):
       print(f'WikidataServices Info from get_wikidata_height: height {height_in_cm} cm has been found for wikidata id {wikidata_id}')
       return height_in_cm   
       
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_height: {str(e)}')
       return None
    
 
-def get_wikidata_weight(wikidata_id):
+def get_wikidata_weight(wikidata_id, entities=None):
 
    try:
       # Validates argument
@@ -298,7 +434,7 @@ def get_wikidata_weight(wikidata_id):
          return None
 
       # Requests Wikidata API
-      weight_claim = get_wikidata_property(wikidata_id, 'P2067')
+      weight_claim = get_entity_claims(wikidata_id, 'P2067', entities)
 
       # Empty response
       if not weight_claim or len(weight_claim) == 0:
@@ -335,12 +471,15 @@ def get_wikidata_weight(wikidata_id):
       print(f'WikidataServices Info from get_wikidata_weigth: weight {weight_in_kg} kg has been found for wikidata id {wikidata_id}')
       return weight_in_kg
       
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_weight: {str(e)}')
       return None
    
    
-def get_wikidata_hand(wikidata_id):
+def get_wikidata_hand(wikidata_id, entities=None):
 
    try:
       # Validates argument 
@@ -349,7 +488,7 @@ def get_wikidata_hand(wikidata_id):
          return None
       
       # Requests Wikidata API
-      hand_claim = get_wikidata_property(wikidata_id, 'P552')
+      hand_claim = get_entity_claims(wikidata_id, 'P552', entities)
 
       # Empty response
       if not hand_claim or len(hand_claim) == 0:
@@ -375,12 +514,15 @@ def get_wikidata_hand(wikidata_id):
       print(f'WikidataServices: hand {formatted_hand} has been found for wikidata id {wikidata_id}')
       return formatted_hand # HAY QUE NORMALIZARLA PARA METERLA EN LA DB
       
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_hand: {str(e)}')
       return None
    
    
-def get_wikidata_networks(wikidata_id):
+def get_wikidata_networks(wikidata_id, entities=None):
    
    try:
       # Validates argument
@@ -402,7 +544,7 @@ def get_wikidata_networks(wikidata_id):
       for network, prop in properties.items():
          
          # Requests Wikidata API
-         username_claim = get_wikidata_property(wikidata_id, prop)
+         username_claim = get_entity_claims(wikidata_id, prop, entities)
 
          # Empty response
          if not username_claim or len(username_claim) == 0:
@@ -429,11 +571,14 @@ def get_wikidata_networks(wikidata_id):
 
       return networks  # HAY QUE NORMALIZAR ANTES DE METER EN DB !!
    
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_networks: {str(e)}')
       return None
    
-def get_wikidata_pro_since(wikidata_id):
+def get_wikidata_pro_since(wikidata_id, entities=None):
    
    try:
       # Validates argument 
@@ -442,7 +587,7 @@ def get_wikidata_pro_since(wikidata_id):
          return None
 
       # Requests Wikidata API
-      pro_since_claim = get_wikidata_property(wikidata_id, 'P2031')
+      pro_since_claim = get_entity_claims(wikidata_id, 'P2031', entities)
 
       # Empty response
       if not pro_since_claim or len(pro_since_claim) == 0:
@@ -462,6 +607,9 @@ def get_wikidata_pro_since(wikidata_id):
 
       return pro_since_year
 
+   except RequestException:
+      # Wikidata unreachable, not an absent value
+      raise
    except Exception as e:
       print(f'WikidataServices Error in get_wikidata_pro_since: {str(e)}')
       return None
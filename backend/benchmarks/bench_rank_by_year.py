@@ -0,0 +1,171 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+
+# Compares query plan and latency of the Players.get_rank_by_year fallback: the
+# original GROUP BY joined on date only, the current GROUP BY joined on player and
+# date with the summary fields, and the ROW_NUMBER form that was tried and dropped,
+# on tennisdb.sqlite or on a synthetic rankings history
+#
+#   python benchmarks/bench_rank_by_year.py --db tennisdb.sqlite
+#   python benchmarks/bench_rank_by_year.py --players 2000 --weeks 1500   (~3M rows)
+
+# SQL generated by the original version (GROUP BY + join on date only)
+OLD_QUERY = """
+   SELECT anon_1.year, rankings.rank
+   FROM rankings JOIN (
+      SELECT CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER) AS year,
+             max(rankings.ranking_date) AS max_date
+      FROM rankings
+      WHERE ? = rankings.player_id
+      GROUP BY CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER)
+   ) AS anon_1 ON rankings.ranking_date = anon_1.max_date
+   WHERE ? = rankings.player_id
+   ORDER BY anon_1.year
+"""
+
+# SQL generated by the current version (GROUP BY + join on player and date), with
+# the best rank, weeks ranked and points of the yearly summary
+NEW_QUERY = """
+   SELECT anon_1.year, rankings.rank, anon_1.best_rank, anon_1.weeks_ranked, rankings.points
+   FROM rankings JOIN (
+      SELECT CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER) AS year,
+             max(rankings.ranking_date) AS max_date,
+             min(rankings.rank) AS best_rank,
+             count(rankings.rank) AS weeks_ranked
+      FROM rankings
+      WHERE rankings.player_id = ?
+      GROUP BY CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER)
+   ) AS anon_1 ON rankings.player_id = ? AND rankings.ranking_date = anon_1.max_date
+   ORDER BY anon_1.year
+"""
+
+# ROW_NUMBER per player and year, same fields: reads the rows once but sorts them
+# for every window, slower than the GROUP BY
+WINDOW_QUERY = """
+   SELECT anon_1.year, anon_1.rank, anon_1.best_rank, anon_1.weeks_ranked, anon_1.points
+   FROM (
+      SELECT CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER) AS year,
+             rankings.rank AS rank,
+             rankings.points AS points,
+             row_number() OVER (
+                PARTITION BY rankings.player_id, CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER)
+                ORDER BY rankings.ranking_date DESC
+             ) AS week_from_end,
+             min(rankings.rank) OVER (
+                PARTITION BY rankings.player_id, CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER)
+             ) AS best_rank,
+             count(rankings.rank) OVER (
+                PARTITION BY rankings.player_id, CAST(STRFTIME('%Y', rankings.ranking_date) AS INTEGER)
+             ) AS weeks_ranked
+      FROM rankings
+      WHERE rankings.player_id = ?
+   ) AS anon_1
+   WHERE anon_1.week_from_end = 1
+   ORDER BY anon_1.year
+"""
+
+
+def build_synthetic_db(path, players, weeks):
+   # Rankings table as in tennisdb.sqlite, one row per player and week
+   if os.path.exists(path):
+      os.remove(path)
+
+   connection = sqlite3.connect(path)
+   connection.execute('PRAGMA journal_mode=OFF')
+   connection.execute('PRAGMA synchronous=OFF')
+   connection.execute('''
+      CREATE TABLE rankings (
+         player_id VARCHAR(7) NOT NULL,
+         ranking_date DATE NOT NULL,
+         points VARCHAR(7),
+         rank INTEGER,
+         PRIMARY KEY (player_id, ranking_date)
+      )
+   ''')
+
+   random.seed(0)
+   first_week = date(1973, 8, 27)
+   dates = [(first_week + timedelta(weeks=week)).isoformat() for week in range(weeks)]
+
+   def rows():
+      for player in range(players):
+         player_id = str(100000 + player)
+         rank = random.randint(1, 2000)
+         for ranking_date in dates:
+            rank = max(1, min(2000, rank + random.randint(-5, 5)))
+            yield (player_id, ranking_date, str(random.randint(0, 12000)), rank)
+
+   connection.executemany('INSERT INTO rankings VALUES (?, ?, ?, ?)', rows())
+   connection.commit()
+   return connection
+
+
+def measure(connection, query, params, repeat):
+   # Median and p95 latency in ms
+   timings = []
+   for _ in range(repeat):
+      start = time.perf_counter()
+      connection.execute(query, params).fetchall()
+      timings.append((time.perf_counter() - start) * 1000)
+   timings.sort()
+   return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__)
+   parser.add_argument('--db', help='Existing database, e.g. tennisdb.sqlite')
+   parser.add_argument('--players', type=int, default=2000, help='Synthetic players')
+   parser.add_argument('--weeks', type=int, default=1500, help='Synthetic weeks by player')
+   parser.add_argument('--sample', type=int, default=20, help='Players measured')
+   parser.add_argument('--repeat', type=int, default=20, help='Runs by player and query')
+   args = parser.parse_args()
+
+   if args.db:
+      connection = sqlite3.connect(args.db)
+   else:
+      path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_rankings.sqlite')
+      print(f'Building synthetic history: {args.players} players x {args.weeks} weeks...')
+      connection = build_synthetic_db(path, args.players, args.weeks)
+
+   total_rows = connection.execute('SELECT COUNT(*) FROM rankings').fetchone()[0]
+   print(f'{total_rows} ranking rows')
+
+   # Players with most weeks ranked, the slowest case
+   player_ids = [row[0] for row in connection.execute(
+      'SELECT player_id FROM rankings GROUP BY player_id ORDER BY COUNT(*) DESC LIMIT ?',
+      (args.sample,)
+   )]
+
+   for name, query, params_for in [
+      ('before (GROUP BY + join on date)', OLD_QUERY, lambda player_id: (player_id, player_id)),
+      ('after (GROUP BY + join on player and date)', NEW_QUERY, lambda player_id: (player_id, player_id)),
+      ('dropped (ROW_NUMBER per player/year)', WINDOW_QUERY, lambda player_id: (player_id,)),
+   ]:
+      print(f'\n{name}')
+      for row in connection.execute('EXPLAIN QUERY PLAN ' + query, params_for(player_ids[0])):
+         print(f'   {row[-1]}')
+
+      medians, p95s = [], []
+      for player_id in player_ids:
+         median, p95 = measure(connection, query, params_for(player_id), args.repeat)
+         medians.append(median)
+         p95s.append(p95)
+      print(f'   median {statistics.median(medians):.2f} ms, p95 {max(p95s):.2f} ms')
+
+   # All versions must return the same ranks, and the same summary fields when they have them
+   for player_id in player_ids:
+      old = connection.execute(OLD_QUERY, (player_id, player_id)).fetchall()
+      new = connection.execute(NEW_QUERY, (player_id, player_id)).fetchall()
+      window = connection.execute(WINDOW_QUERY, (player_id,)).fetchall()
+      assert old == [row[:2] for row in new], f'Different ranks for player {player_id}'
+      assert new == window, f'Different summary fields for player {player_id}'
+   print('\nSame years and ranks for all measured players')
+
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,148 @@
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Measures cold start of the backend with python -X importtime: import of main and
+# create_app (what a gunicorn worker or serverless invocation pays), then init_database
+# apart (flask --app main init-database, run once before serving) on a database already
+# up to date, on a new database (schema creation) and, with --db, on a copy of that
+# database (its schema upgrade). Each step is timed alone, after the previous ones,
+# in the same fresh interpreter.
+# Lists the slowest imports, and fails when startup exceeds --max-ms (CI-style check)
+#
+# Every run uses databases in a temporary folder, the working database is never
+# opened for writing (--db is only read, through the SQLite backup API)
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --repeat 10 --max-ms 1500
+#   python benchmarks/bench_startup.py --db tennisdb.sqlite
+
+BACKEND_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREATE_APP = "app = main.create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{path}'}})"
+
+# Timed code: the timer restarts at start = time.perf_counter()
+TIMED_CREATE_APP = 'import main; start = time.perf_counter(); ' + CREATE_APP
+TIMED_INIT_DATABASE = f'import main; {CREATE_APP}; app.app_context().push(); ' \
+   'start = time.perf_counter(); main.init_database(app)'
+
+# Modules only needed by the enrichment worker and commands, must not load at startup
+LAZY_MODULES = ['Services.wikidata_services', 'Services.wikidata_async_services', 'requests', 'pycountry']
+
+# import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_startup(code, cwd):
+   # Runs code in a fresh interpreter, returns (ms, {module: cumulative ms}, lazy modules loaded)
+   # main is found through PYTHONPATH, cwd keeps any relative path away from the backend folder
+   env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_PATH, os.environ.get('PYTHONPATH')])))
+   result = subprocess.run(
+      [sys.executable, '-X', 'importtime', '-c',
+       f'import sys, time; start = time.perf_counter(); {code}; '
+       f'print("startup", (time.perf_counter() - start) * 1000, '
+       f'*[name for name in {LAZY_MODULES!r} if name in sys.modules])'],
+      cwd=cwd, env=env, capture_output=True, text=True, check=True
+   )
+
+   imports = {}
+   for line in result.stderr.splitlines():
+      match = IMPORTTIME_LINE.match(line)
+      if not match:
+         continue
+      # Interpreter startup (site and .pth files) comes first, it is not part of the app
+      if match.group(4) == 'site' and len(match.group(3)) == 1:
+         imports = {}
+      # Imports of main and their own imports, deeper ones are counted in their cumulative time
+      elif len(match.group(3)) <= 3:
+         imports[match.group(4)] = int(match.group(2)) / 1000
+
+   startup_line = [line for line in result.stdout.splitlines() if line.startswith('startup ')][-1]
+   _, elapsed, *loaded = startup_line.split()
+   return float(elapsed), imports, loaded
+
+
+def copy_database(source, destination):
+   # Consistent copy, including changes still in the WAL, without writing to the source
+   source_connection = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+   destination_connection = sqlite3.connect(destination)
+   try:
+      source_connection.backup(destination_connection)
+   finally:
+      source_connection.close()
+      destination_connection.close()
+
+
+def remove_database(path):
+   for suffix in ('', '-wal', '-shm'):
+      if os.path.exists(path + suffix):
+         os.remove(path + suffix)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__)
+   parser.add_argument('--repeat', type=int, default=5, help='Cold starts by measure')
+   parser.add_argument('--top', type=int, default=10, help='Slowest imports listed')
+   parser.add_argument('--max-ms', type=float, help='Fails when median import of main exceeds it')
+   parser.add_argument('--db', help='Database whose schema upgrade is measured, on a copy')
+   args = parser.parse_args()
+
+   folder = tempfile.mkdtemp(prefix='bench_startup_')
+   try:
+      new_path = os.path.join(folder, 'new.sqlite')
+      current_path = os.path.join(folder, 'current.sqlite')
+      copy_path = os.path.join(folder, 'copy.sqlite')
+
+      # Database already up to date, created once before measuring
+      run_startup(TIMED_INIT_DATABASE.format(path=current_path), folder)
+
+      # name: (code, preparation before every run)
+      startups = {
+         'import main': ('import main', None),
+         'create_app()': (TIMED_CREATE_APP.format(path=current_path), None),
+         'init_database(), up-to-date database': (TIMED_INIT_DATABASE.format(path=current_path), None),
+         'init_database(), new database': (
+            TIMED_INIT_DATABASE.format(path=new_path), lambda: remove_database(new_path)
+         )
+      }
+      if args.db:
+         source = os.path.abspath(args.db)
+         startups['init_database(), copy of ' + os.path.basename(source)] = (
+            TIMED_INIT_DATABASE.format(path=copy_path),
+            lambda: (remove_database(copy_path), copy_database(source, copy_path))
+         )
+
+      medians = {}
+      for name, (code, prepare) in startups.items():
+         timings, cumulative = [], {}
+         for _ in range(args.repeat):
+            if prepare:
+               prepare()
+            elapsed, imports, loaded = run_startup(code, folder)
+            timings.append(elapsed)
+            for module, milliseconds in imports.items():
+               cumulative.setdefault(module, []).append(milliseconds)
+
+         medians[name] = statistics.median(timings)
+         print(f'\n{name}: median {medians[name]:.0f} ms, min {min(timings):.0f} ms over {args.repeat} runs')
+         slowest = sorted(cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+         for module, values in slowest[:args.top]:
+            print(f'   {statistics.median(values):8.1f} ms  {module}')
+         if loaded:
+            print(f'   Warning: loaded at startup: {", ".join(loaded)}')
+   finally:
+      shutil.rmtree(folder, ignore_errors=True)
+
+   if args.max_ms is not None and medians['import main'] > args.max_ms:
+      print(f'\nFAILED: import main takes {medians["import main"]:.0f} ms, more than {args.max_ms:.0f} ms')
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+   main()
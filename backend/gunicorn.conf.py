@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+
+# Production serving of the backend, from the backend folder:
+#
+#   gunicorn -c gunicorn.conf.py
+#   flask --app main enrichment-worker     (separate process, the web workers do not start it)
+#
+# Settings can be overridden with GUNICORN_* environment variables, e.g. GUNICORN_WORKERS=4
+#
+# Every worker opens the SQLite database with the pragmas of create_app: WAL journal,
+# synchronous=NORMAL and busy_timeout, and serves GET requests on read-only connections.
+# Workers read concurrently while one writer (a request, the enrichment worker or
+# import-rankings) holds the write lock, writers wait for it up to busy_timeout.
+# Cached responses are validated by versions stored in the database, so a change
+# made through one worker is seen by the others.
+
+wsgi_app = 'main:create_app()'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processes, each with its own caches and database connections
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 9)))
+
+# Threads by process, SQLite and JSON work release the GIL only in part
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Exports of the whole rankings table are streamed for a while
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Restarts workers now and then, bounding the memory of their caches
+max_requests = 5000
+max_requests_jitter = 500
+
+# The app is built in every worker after the fork: SQLite connections must not be
+# shared between processes
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+   # Upgrades the database once in the master, before the workers start together,
+   # then closes its connections so that forked workers do not inherit them
+   # Workers only build the app, create_app does not touch the database
+   from main import create_app, db, init_database
+   
+   app = create_app()
+   with app.app_context():
+      init_database(app)
+      for engine in db.engines.values():
+         engine.dispose()
@@ -1,38 +1,175 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, has_request_context, jsonify, \
+                  make_response, request, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy # ORM
-from sqlalchemy import func, desc, extract
-import pycountry
+from flask_sqlalchemy.session import Session
+from sqlalchemy import MetaData, event, func, desc, extract, and_, or_, select, update, tuple_, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateTable
+import base64
+import click
+import functools
+import hashlib
+import json
 import os
-from datetime import datetime
+import re
+import socket
+import threading
+import time
+from datetime import datetime, date, timedelta
 
-from Services.wikidata_services import get_wikidata_id,\
-                                       get_wikidata_country,\
-                                       get_wikidata_birth_date, \
-                                       get_wikidata_height, \
-                                       get_wikidata_weight, \
-                                       get_wikidata_hand
+from Services.cache_services import TTLCache, LRUCache
+from Services.country_codes import to_alpha2
+from Services.rankings_services import ranking_files, iter_ranking_rows, batched, lttb
+from Services.export_services import EXPORT_FORMATS, export_tables, stream_rankings
 
 # -------------------------- CONFIGURATION ---------------------------------- #
 
-# instanciates a Flask application
-app = Flask(__name__) 
-# updates the application constantly
-app.config.from_object(__name__) 
+def configure(app):
+   # Default settings of the application
+   
+   # determines the database system used
+   # and path to database relative to the app instance folder
+   app.config['SQLALCHEMY_DATABASE_URI'] =  f"sqlite:///{os.path.abspath('tennisdb.sqlite')}"
+   # reduces terminal warnings
+   app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+   
+   # SQLite connections shared by several processes (web workers, enrichment worker, imports)
+   app.config['SQLITE_JOURNAL_MODE'] = 'WAL'       # readers and the writer do not block each other
+   app.config['SQLITE_SYNCHRONOUS'] = 'NORMAL'     # consistent in WAL mode, fsync at checkpoints
+   app.config['SQLITE_BUSY_TIMEOUT'] = 5000        # ms waiting for a lock before 'database is locked'
+   app.config['SQLITE_READ_ONLY_GETS'] = True      # GET requests on read-only connections
+   
+   # background worker that completes players with Wikidata
+   app.config['ENRICHMENT_WORKER_ENABLED'] = True
+   app.config['ENRICHMENT_WORKER_INTERVAL'] = 30     # seconds idle between scans
+   app.config['ENRICHMENT_WORKER_BATCH_SIZE'] = 30   # jobs claimed at once, a page of players
+   app.config['ENRICHMENT_CONCURRENCY'] = 8          # concurrent Wikidata lookups
+   app.config['ENRICHMENT_MAX_ATTEMPTS'] = 3         # failed attempts before the cooldown
+   app.config['ENRICHMENT_JOB_TIMEOUT'] = 600        # seconds before a running job is requeued
+   app.config['ENRICHMENT_RETRY_INTERVAL'] = 60      # seconds before a retry, doubled by attempt
+   app.config['ENRICHMENT_FAILED_COOLDOWN'] = 24 * 3600   # seconds before failed jobs start over
+   
+   # full-text index of players names (SQLite FTS5), ilike search when disabled
+   app.config['PLAYERS_SEARCH_INDEX'] = True
+   
+   # players counts of searches in GET /players
+   app.config['PLAYERS_COUNT_CACHE_TTL'] = 30        # seconds
+   app.config['PLAYERS_COUNT_CACHE_SIZE'] = 1000     # search terms
+   
+   # weekly leaderboards in GET /rankings/<date>
+   app.config['RANKINGS_TOP_DEFAULT'] = 100          # players by default
+   app.config['RANKINGS_TOP_MAX'] = 2000             # players at most
+   app.config['RANKINGS_CACHE_MAX_AGE'] = 7 * 24 * 3600   # seconds, past weeks never change
+   app.config['RANKINGS_LATEST_MAX_AGE'] = 300             # seconds, a new week may be loaded
+   app.config['RANKINGS_COMPARE_MAX_PLAYERS'] = 10   # players in GET /rankings/compare
+   
+   # responses of GET player and rankings routes, validated by versions of their data
+   app.config['RESPONSE_CACHE_SIZE'] = 2000          # responses
+   app.config['RESPONSE_CACHE_TTL'] = 3600           # seconds
+   
+   # serialized players of GET /players pages
+   app.config['PLAYERS_FRAGMENTS_CACHE_SIZE'] = 20000   # players
+   
+   # persistent cache of Wikidata claims
+   app.config['WIKIDATA_CACHE_PATH'] = os.path.abspath('wikidata_cache.sqlite')
+   app.config['WIKIDATA_CACHE_TTL'] = 30 * 24 * 3600          # seconds for found claims
+   app.config['WIKIDATA_CACHE_NEGATIVE_TTL'] = 24 * 3600      # seconds for absent properties
+   app.config['WIKIDATA_CACHE_MAX_ENTRIES'] = 100000
+   
+   # shared HTTP client for Wikidata API
+   app.config['WIKIDATA_MAX_CONNECTIONS'] = 8         # pooled keep-alive connections
+   app.config['WIKIDATA_REQUESTS_PER_SECOND'] = 5     # per process
+   app.config['WIKIDATA_MAX_RETRIES'] = 5             # on 429, 5XX, maxlag and connection errors
+   app.config['WIKIDATA_MAXLAG'] = 5                  # seconds of replication lag accepted
+   
+   # We need: username, password, server location, database name.
+
+
+# Routes and commands, registered on the application by create_app
+api = Blueprint('api', __name__, cli_group=None)
+
+# Methods served through the read-only database connections
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+
+class RoutingSession(Session):
+   # Sends queries of GET requests to the read-only engine, when configured,
+   # so readers never take the write lock of SQLite nor write by mistake
+   
+   def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+      if bind is None and read_only_request():
+         return self._db.engines['readonly']
+      return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only_request():
+   return (
+      has_request_context()
+      and request.method in READ_ONLY_METHODS
+      and 'readonly' in db.engines
+   )
 
-# determines the database system used 
-# and path to database relative to the app instance folder
-app.config['SQLALCHEMY_DATABASE_URI'] =  f"sqlite:///{os.path.abspath('tennisdb.sqlite')}"
-# reduces terminal warnings
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False 
 
-# We need: username, password, server location, database name. 
+# instantiates the database, bound to the application by create_app
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-# enablse CORS, the route and leave it open to other origins
-CORS(app, resources={r"/*":{'origins':"*"}}) 
+# In-process caches, instantiated by create_app with the application settings
+players_count_cache = None
+players_fragments_cache = None
+responses_cache = None
+
+
+def configure_caches(app):
+   global players_count_cache, players_fragments_cache, responses_cache
+   
+   # instantiates the cache of players counts by search term
+   players_count_cache = TTLCache(
+      maxsize=app.config['PLAYERS_COUNT_CACHE_SIZE'],
+      ttl=app.config['PLAYERS_COUNT_CACHE_TTL']
+   )
+   
+   # instantiates the cache of serialized players by player_id
+   players_fragments_cache = LRUCache(maxsize=app.config['PLAYERS_FRAGMENTS_CACHE_SIZE'])
+   
+   # instantiates the cache of responses by route and arguments
+   responses_cache = TTLCache(
+      maxsize=app.config['RESPONSE_CACHE_SIZE'],
+      ttl=app.config['RESPONSE_CACHE_TTL']
+   )
+
+
+# Set once the Wikidata cache and client are configured
+wikidata_configured = False
+
+
+def configure_wikidata(app):
+   # Wikidata services load requests and its connection pool, so they are imported
+   # only by the enrichment worker and commands, not by web workers
+   global wikidata_configured
+   if wikidata_configured:
+      return
+   from Services.wikidata_services import configure_claims_cache, configure_wikidata_client
+   
+   # instantiates the Wikidata claims cache
+   configure_claims_cache(
+      app.config['WIKIDATA_CACHE_PATH'],
+      ttl=app.config['WIKIDATA_CACHE_TTL'],
+      negative_ttl=app.config['WIKIDATA_CACHE_NEGATIVE_TTL'],
+      max_entries=app.config['WIKIDATA_CACHE_MAX_ENTRIES']
+   )
+   
+   # instantiates the shared Wikidata client
+   configure_wikidata_client(
+      max_connections=app.config['WIKIDATA_MAX_CONNECTIONS'],
+      requests_per_second=app.config['WIKIDATA_REQUESTS_PER_SECOND'],
+      max_retries=app.config['WIKIDATA_MAX_RETRIES'],
+      maxlag=app.config['WIKIDATA_MAXLAG']
+   )
+   wikidata_configured = True
 
-# instantiates the database
-db = SQLAlchemy(app)
 
 # -------------------------- AUX FUNCTIONS ---------------------------------- #
 
@@ -53,22 +190,195 @@ def normalize_values_into_db(field, value):
       return datetime.strptime(value, '%Y-%m-%d').date() if value else None
    
    if field == 'country':
-      try:
-         if value and len(value) == 3:
-            country = pycountry.countries.get(alpha_3=value)
-            return country.alpha_2.lower() if country else 'unknown'
-         if value and len(value) == 2:
-            return value.lower()
-         return 'unknown'
-      
-      except Exception as e:
-         error_msg = f'Error converting country {value}: {str(e)}'
-         app.logger.error(error_msg, exc_info=True)
+      # ISO alpha-2, ISO alpha-3 or IOC code to lowercase alpha-2
+      return to_alpha2(value) or 'unknown'
+
+      
+   
+def encode_cursor(values):
+   # Opaque cursor for keyset pagination
+   return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+   # Raises ValueError when cursor is not valid
+   try:
+      padding = '=' * (-len(cursor) % 4)
+      values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+   except Exception:
+      raise ValueError(f'Invalid cursor {cursor}')
+   
+   if not isinstance(values, dict):
+      raise ValueError(f'Invalid cursor {cursor}')
+   return values
+
+
+def get_counter(name, compute):
+   # Reads a maintained counter, computing it only the first time
+   counter = db.session.get(Counters, name)
+   if counter is not None:
+      return counter.value
+   
+   value = compute()
+   
+   # GET requests cannot write, counters read by them are computed by init_database
+   if read_only_request():
+      return value
+   
+   db.session.execute(
+      sqlite_insert(Counters).values(name=name, value=value).on_conflict_do_nothing()
+   )
+   db.session.commit()
+   return db.session.get(Counters, name).value
+
+
+def increment_counter(name, delta):
+   # Updates counter in current transaction, if it has already been computed
+   db.session.execute(
+      update(Counters)
+      .where(Counters.name == name)
+      .values(value=Counters.value + delta)
+   )
+
+
+def refresh_players_count():
+   # Recounts players in current transaction, including those added or removed
+   # outside the API (e.g. players table loaded from CSV files)
+   total_players = db.session.query(Players).count()
+   db.session.execute(
+      sqlite_insert(Counters)
+      .values(name='players', value=total_players)
+      .on_conflict_do_update(index_elements=[Counters.name], set_={'value': total_players})
+   )
+   return total_players
+
+
+# Recounts players of a running app: flask --app main refresh-players-count
+@api.cli.command('refresh-players-count')
+def refresh_players_count_command():
+   total_players = refresh_players_count()
+   db.session.commit()
+   click.echo(f'{total_players} players counted')
+
+
+def bump_versions(player_ids=()):
+   # Marks data as changed in current transaction, so cached responses get new ETags
+   # player_ids: players whose data changed, or None when it may be any player
+   # Leaderboards show players names, so they change with any player
+   names = ['rankings_version']
+   if player_ids is None:
+      names.append('players_generation')
+   else:
+      names.extend(f'player_version:{player_id}' for player_id in player_ids)
+   
+   db.session.connection().exec_driver_sql(
+      'INSERT INTO counters (name, value) VALUES (?, 1) '
+      'ON CONFLICT (name) DO UPDATE SET value = value + 1',
+      [(name,) for name in names]
+   )
+
+
+def read_versions(names):
+   # Values of version counters, 0 when never bumped
+   values = dict(
+      db.session.query(Counters.name, Counters.value).filter(Counters.name.in_(names)).all()
+   )
+   return [values.get(name, 0) for name in names]
+
+
+def player_versions(player_id):
+   # Counters a player response depends on
+   return [f'player_version:{player_id}', 'players_generation']
+
+
+def rankings_versions(**kwargs):
+   # Counters a rankings response depends on
+   return ['rankings_version']
+
+
+def cached_response(versions):
+   # Caches successful responses of a GET route by path and arguments, with a strong
+   # ETag built from the version counters of their data (versions of route arguments)
+   # Answers 304 without running the route when the client already has the response
+   # and this process has it cached, the route runs once otherwise for its headers
+   def decorator(route):
+      
+      @functools.wraps(route)
+      def wrapper(**kwargs):
+         key = (request.path, tuple(sorted(request.args.items(multi=True))))
+         etag = hashlib.sha1(
+            json.dumps([key, read_versions(versions(**kwargs))]).encode()
+         ).hexdigest()
+         
+         response = None
+         cached = responses_cache.get(key)
+         if not cached or cached[0] != etag:
+            response = make_response(route(**kwargs))
+            if response.status_code != 200:
+               return response
+            
+            # Revalidated on every view, unless route allows caching for a while
+            response.headers.setdefault('Cache-Control', 'no-cache')
+            cached = (
+               etag,
+               response.get_data(),
+               response.mimetype,
+               {'Cache-Control': response.headers['Cache-Control']}
+            )
+            responses_cache.set(key, cached)
+         
+         _, body, mimetype, headers = cached
          
-         return 'unknown'
+         # 304 keeps Cache-Control of the full response, e.g. max-age of past weeks
+         if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+         elif response is None:
+            response = Response(body, mimetype=mimetype, headers=headers)
+         
+         response.set_etag(etag)
+         return response
+      
+      return wrapper
+   
+   return decorator
+
 
+def player_fragments(players_objects_list):
+   # Serialized players, from cache when their versions have not changed since
+   # Versions keep fragments valid when another process has written the player
+   if not players_objects_list:
+      return []
+   
+   names = ['players_generation'] + [
+      f'player_version:{player_object.player_id}' for player_object in players_objects_list
+   ]
+   generation, *versions = read_versions(names)
+   
+   fragments = []
+   for player_object, version in zip(players_objects_list, versions):
+      cached = players_fragments_cache.get(player_object.player_id)
+      if cached and cached[0] == (version, generation):
+         fragments.append(cached[1])
+         continue
       
+      fragment = current_app.json.dumps(player_object.to_dict())
+      players_fragments_cache.set(player_object.player_id, ((version, generation), fragment))
+      fragments.append(fragment)
    
+   return fragments
+
+
+def invalidate_player_fragments(player_ids):
+   # Drops serialized players written by this process, after commit
+   for player_id in player_ids:
+      players_fragments_cache.delete(player_id)
+
+
+def normalize_search(search):
+   # Same key for searches differing only in case or spaces
+   return ' '.join(search.lower().split())
+
+      
 # ---------------------------- DATA MODELS ---------------------------------- #
 
 # Model for table Players
@@ -85,8 +395,20 @@ class Players(db.Model):
    instagram = db.Column(db.String(100))
    facebook = db.Column(db.String(100))
    x_twitter = db.Column(db.String(100))
+   
+   # Best rank of career, maintained by rankings import
+   best_rank = db.Column(db.Integer)
+   best_rank_date = db.Column(db.Date)
+   weeks_at_best = db.Column(db.Integer)
+   
    rankings = db.relationship('Rankings', backref='player', lazy='dynamic')
    
+   # Supports players list ordered by birth date or best rank (keyset pagination)
+   __table_args__ = (
+      db.Index('ix_players_birth_date_player_id', 'birth_date', 'player_id'),
+      db.Index('ix_players_best_rank_player_id', 'best_rank', 'player_id'),
+   )
+   
    def to_dict(self):
       # Converts registers to dict and normalizes some values according to frontend
       
@@ -94,17 +416,8 @@ class Players(db.Model):
          return value if value != 'unknown' else '-'
       
       def normalize_country(country):
-         try:
-            if country and len(country) == 3:
-               country = pycountry.countries.get(alpha_3=country)
-               return country.alpha_2.lower() if country else 'unknown'
-            if country and len(country) == 2:
-               return country.lower()
-            return 'unknown'
-         
-         except Exception as e:
-            print(f'Error converting country: {country}, Error: {e}')
-            return 'unknown'   
+         # Stored as alpha-2 since normalize-countries migration
+         return to_alpha2(country) or 'unknown'
       
       def normalize_hand(hand):
          if hand == 'R':
@@ -120,6 +433,11 @@ class Players(db.Model):
             return birth_date.strftime('%d-%m-%Y') 
          return None
       
+      def format_best_rank_date(best_rank_date):
+         if best_rank_date:
+            return best_rank_date.strftime('%d-%m-%Y')
+         return None
+      
       return {
          'player_id': self.player_id,
          'name_first': format_unknown(self.name_first),
@@ -129,7 +447,10 @@ class Players(db.Model):
          'country': normalize_country(self.country),
          'height': format_unknown(self.height),
          'wikidata_id': format_unknown(self.wikidata_id),
-         'fullname': self.fullname
+         'fullname': self.fullname,
+         'best_rank': self.best_rank,
+         'best_rank_date': format_best_rank_date(self.best_rank_date),
+         'weeks_at_best': self.weeks_at_best
       }
 
    def get_best_ranking(self):
@@ -147,31 +468,85 @@ class Players(db.Model):
       return rankings_list_in_player
    
    def get_rank_by_year(self):
+      
+      # Reads yearly summary, precomputed in player_year_rank
+      year_ranks = (
+         PlayerYearRank.query
+         .filter_by(player_id=self.player_id)
+         .order_by(PlayerYearRank.year)
+         .all()
+      )
+      if year_ranks:
+         return [year_rank.to_dict() for year_rank in year_ranks]
+
+      # Summary not refreshed yet for this player, same values as YEAR_RANKS_SELECT
+      # Groups rankings of the player by year, with last date, best rank and weeks ranked
+      year = extract('year', Rankings.ranking_date)
+      years = (
+         select(
+            year.label('year'),
+            func.max(Rankings.ranking_date).label('max_date'),
+            func.min(Rankings.rank).label('best_rank'),
+            func.count(Rankings.rank).label('weeks_ranked')
+         )
+         .where(Rankings.player_id == self.player_id)
+         .group_by(year)
+         .subquery()
+      )
+      
+      # Retrieves rank and points of the last week of each year
+      # Joined on player and date, both columns of the primary key
+      query = db.session.execute(
+         select(years.c.year, Rankings.rank, years.c.best_rank, years.c.weeks_ranked, Rankings.points)
+         .select_from(Rankings)
+         .join(years, and_(Rankings.player_id == self.player_id, Rankings.ranking_date == years.c.max_date))
+         .order_by(years.c.year)
+      )
 
-      # Groups rankings by year and retrieves last ranking by year
-      subquery = self.rankings.with_entities(
-         extract('year', Rankings.ranking_date).label('year'),    
-         func.max(Rankings.ranking_date).label('max_date')
-      ).group_by(extract('year', Rankings.ranking_date)).subquery()
-
-      # Retrieves year and rank 
-      # Filters rankings where ranking_date=max_date for each year
-      query = self.rankings.join(   
-         subquery,
-         (Rankings.ranking_date == subquery.c.max_date)
-      ).with_entities(       # selected columns
-         subquery.c.year,
-         Rankings.rank
-      ).order_by(subquery.c.year)
-
-      # Formats for echarts
       return [
-         {
-            'year': int(year),
-            'rank': rank
-         }
-         for year, rank in query
+         PlayerYearRank.format_year(int(year), rank, best_rank, weeks_ranked, points)
+         for year, rank, best_rank, weeks_ranked, points in query
       ]
+   
+   def get_rankings_history(self, date_from=None, date_to=None, resolution='week'):
+      # Ranking history between dates, one point per week, month or year
+      # Each point is the last week of its period, with the best rank of the period
+      # Returns list of tuples (ranking_date, rank, best_rank, points)
+      filters = [Rankings.player_id == self.player_id, Rankings.rank.isnot(None)]
+      if date_from:
+         filters.append(Rankings.ranking_date >= date_from)
+      if date_to:
+         filters.append(Rankings.ranking_date <= date_to)
+      
+      if resolution == 'week':
+         return db.session.execute(
+            select(Rankings.ranking_date, Rankings.rank, Rankings.rank, Rankings.points)
+            .where(*filters)
+            .order_by(Rankings.ranking_date)
+         ).all()
+      
+      # Numbers weeks of each period from the last one, in SQL
+      period = func.strftime(RANKINGS_RESOLUTIONS[resolution], Rankings.ranking_date)
+      weeks = (
+         select(
+            Rankings.ranking_date,
+            Rankings.rank,
+            Rankings.points,
+            func.min(Rankings.rank).over(partition_by=period).label('best_rank'),
+            func.row_number().over(
+               partition_by=period,
+               order_by=desc(Rankings.ranking_date)
+            ).label('week_from_end')
+         )
+         .where(*filters)
+         .subquery()
+      )
+      
+      return db.session.execute(
+         select(weeks.c.ranking_date, weeks.c.rank, weeks.c.best_rank, weeks.c.points)
+         .where(weeks.c.week_from_end == 1)
+         .order_by(weeks.c.ranking_date)
+      ).all()
 
       
    
@@ -180,17 +555,19 @@ class Players(db.Model):
 class Rankings(db.Model):
    player_id = db.Column(db.String(7), db.ForeignKey('players.player_id'), primary_key=True)
    ranking_date = db.Column(db.Date, primary_key=True)
-   points = db.Column(db.String(7))
+   points = db.Column(db.Integer)   # NULL when unknown
    rank = db.Column(db.Integer)
+   
+   # Supports weekly leaderboards and latest week lookup
+   __table_args__ = (
+      db.Index('ix_rankings_ranking_date_rank', 'ranking_date', 'rank'),
+   )
 
    def to_dict(self):
       # Converts registers to dict and normalizes some values according to frontend
       
-      def format_unknown(value):
-         return value if value != "unknown" else "-"
-            
       def normalize_points(points):
-         return format_unknown(points)
+         return points if points is not None else '-'
       
       def format_ranking_date(ranking_date):
          if ranking_date: 
@@ -205,10 +582,954 @@ class Rankings(db.Model):
       }
 
 
+# Model for table EnrichmentJobs
+# Persistent queue of players whose missing values are searched in Wikidata
+class EnrichmentJobs(db.Model):
+   player_id = db.Column(db.String(7), db.ForeignKey('players.player_id'), primary_key=True)
+   status = db.Column(db.String(10), nullable=False, default='pending', index=True) # pending, running, done, failed
+   attempts = db.Column(db.Integer, nullable=False, default=0)
+   worker = db.Column(db.String(40))
+   last_error = db.Column(db.String(255))
+   updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+   next_attempt_at = db.Column(db.DateTime) # not claimed before, None when ready
+
+
+# Model for table PlayerYearRank
+# Yearly ranking summary by player, refreshed when rankings are loaded
+class PlayerYearRank(db.Model):
+   player_id = db.Column(db.String(7), db.ForeignKey('players.player_id'), primary_key=True)
+   year = db.Column(db.Integer, primary_key=True)
+   year_end_rank = db.Column(db.Integer)
+   year_end_date = db.Column(db.Date)
+   year_end_points = db.Column(db.Integer)
+   best_rank = db.Column(db.Integer)
+   weeks_ranked = db.Column(db.Integer)
+   
+   def to_dict(self):
+      return PlayerYearRank.format_year(
+         self.year, self.year_end_rank, self.best_rank, self.weeks_ranked, self.year_end_points
+      )
+   
+   @staticmethod
+   def format_year(year, rank, best_rank, weeks_ranked, points):
+      # Year of get_rank_by_year, from the summary or from rankings, for echarts
+      # Unknown points as '-', as in Rankings.to_dict
+      return {
+         'year': year,
+         'rank': rank,
+         'best_rank': best_rank,
+         'weeks_ranked': weeks_ranked,
+         'points': points if points is not None else '-'
+      }
+
+
+# Model for table Counters
+# Counts maintained by write handlers, e.g. total players for GET /players
+class Counters(db.Model):
+   name = db.Column(db.String(50), primary_key=True)
+   value = db.Column(db.Integer, nullable=False)
+
+
+def add_missing_columns():
+   # Adds columns of models missing in existing tables, e.g. players.best_rank
+   # create_all only creates missing tables
+   # Returns {table name: [columns added]}
+   added_columns = {}
+   with db.engine.begin() as connection:
+      for table in db.metadata.sorted_tables:
+         existing_columns = {
+            row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({table.name})')
+         }
+         for column in table.columns:
+            if column.name in existing_columns:
+               continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            added_columns.setdefault(table.name, []).append(column.name)
+   return added_columns
+
+
+# Periods of ranking history: strftime format of period, None for every week
+RANKINGS_RESOLUTIONS = {
+   'week': None,
+   'month': '%Y-%m',
+   'year': '%Y'
+}
+
+
+# Orders of players list: column, descending
+PLAYERS_SORTS = {
+   'birth_date': (Players.birth_date, True),
+   'best_rank': (Players.best_rank, False)
+}
+
+
+# --------------------------- PLAYERS SEARCH -------------------------------- #
+
+# FTS5 index of players names, synced by triggers on every insert, update and delete
+# unicode61 with remove_diacritics matches 'lopez' with 'López'
+# External content index: names are read from players, FTS rowid is players rowid,
+# so triggers update the index by rowid instead of scanning it for a player_id
+PLAYERS_SEARCH_SCHEMA = [
+   """
+   CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(
+      name_first, name_last, fullname,
+      content = 'players', content_rowid = 'rowid',
+      tokenize = 'unicode61 remove_diacritics 2',
+      prefix = '2 3'
+   )
+   """,
+   """
+   CREATE TRIGGER IF NOT EXISTS players_fts_insert AFTER INSERT ON players BEGIN
+      INSERT INTO players_fts (rowid, name_first, name_last, fullname)
+      VALUES (new.rowid, new.name_first, new.name_last, new.fullname);
+   END
+   """,
+   """
+   CREATE TRIGGER IF NOT EXISTS players_fts_delete AFTER DELETE ON players BEGIN
+      INSERT INTO players_fts (players_fts, rowid, name_first, name_last, fullname)
+      VALUES ('delete', old.rowid, old.name_first, old.name_last, old.fullname);
+   END
+   """,
+   """
+   CREATE TRIGGER IF NOT EXISTS players_fts_update
+   AFTER UPDATE OF name_first, name_last, fullname ON players BEGIN
+      INSERT INTO players_fts (players_fts, rowid, name_first, name_last, fullname)
+      VALUES ('delete', old.rowid, old.name_first, old.name_last, old.fullname);
+      INSERT INTO players_fts (rowid, name_first, name_last, fullname)
+      VALUES (new.rowid, new.name_first, new.name_last, new.fullname);
+   END
+   """
+]
+
+# Previous index, with its own copy of names keyed by an UNINDEXED player_id
+PLAYERS_SEARCH_PREVIOUS_SCHEMA = [
+   'DROP TRIGGER IF EXISTS players_fts_insert',
+   'DROP TRIGGER IF EXISTS players_fts_delete',
+   'DROP TRIGGER IF EXISTS players_fts_update',
+   'DROP TABLE IF EXISTS players_fts'
+]
+
+def rebuild_players_search():
+   # Fills the index again from players
+   db.session.execute(text("INSERT INTO players_fts (players_fts) VALUES ('rebuild')"))
+
+
+def setup_players_search():
+   # Creates players search index, filled from players the first time
+   # Returns False when SQLite has been built without FTS5
+   try:
+      index_sql = db.session.execute(
+         text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'players_fts'")
+      ).scalar()
+      
+      # Index of a previous version is replaced
+      if index_sql and 'content' not in index_sql:
+         for statement in PLAYERS_SEARCH_PREVIOUS_SCHEMA:
+            db.session.execute(text(statement))
+         index_sql = None
+      
+      for statement in PLAYERS_SEARCH_SCHEMA:
+         db.session.execute(text(statement))
+      
+      if not index_sql:
+         rebuild_players_search()
+      
+      db.session.commit()
+      return True
+   
+   except OperationalError as e:
+      db.session.rollback()
+      current_app.logger.warning(f'Players search index not available, using ilike search: {str(e)}')
+      return False
+
+
+# Players rowids may change with VACUUM, as player_id is not an INTEGER PRIMARY KEY
+# Rebuilds the index afterwards: flask --app main rebuild-players-search
+@api.cli.command('rebuild-players-search')
+def rebuild_players_search_command():
+   if not players_search_available():
+      raise click.ClickException('Players search index is not available')
+   
+   start_time = time.monotonic()
+   rebuild_players_search()
+   db.session.commit()
+   click.echo(f'Players search index rebuilt in {time.monotonic() - start_time:.1f}s')
+
+
+def players_search_match(search, columns):
+   # Composes FTS5 query: every word of search as prefix, in any of the columns
+   # Returns None when search has no words
+   words = re.findall(r'\w+', search)
+   if not words:
+      return None
+   
+   column_filter = '{' + ' '.join(columns) + '}'
+   return ' AND '.join(f'{column_filter} : "{word}"*' for word in words)
+
+
+def filter_players_by_search(query, search, columns):
+   # Filters players query by search in columns, with the index when available
+   match = players_search_match(search, columns) if players_search_available() else None
+   
+   if match:
+      return query.filter(
+         text('players.rowid IN (SELECT rowid FROM players_fts WHERE players_fts MATCH :match)')
+         .bindparams(match=match)
+      )
+   
+   # Previous search, without index
+   return query.filter(or_(*(
+      getattr(Players, column).ilike(f'%{search}%') for column in columns
+   )))
+
+
+# Set by init_database, or on first search when None
+players_search_enabled = None
+
+def players_search_available():
+   # Whether searches use the index: enabled and created by init_database
+   global players_search_enabled
+   if players_search_enabled is None:
+      players_search_enabled = current_app.config['PLAYERS_SEARCH_INDEX'] and db.session.execute(
+         text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'players_fts'")
+      ).scalar() is not None
+   return players_search_enabled
+
+
+# ------------------------- RANKINGS SUMMARIES ------------------------------ #
+
+# Points of rankings as integers, any other value ('unknown', '') as NULL,
+# for databases whose rankings.points is still VARCHAR (see migrate-rankings-points)
+POINTS_AS_INTEGER = """
+   CASE WHEN CAST(TRIM(points) AS INTEGER) || '' = TRIM(points)
+        THEN CAST(TRIM(points) AS INTEGER) END
+"""
+
+# Yearly summary of rankings: last week of the year, best rank, weeks ranked
+YEAR_RANKS_SELECT = """
+   SELECT player_id, year, rank, ranking_date, {points}, best_rank, weeks_ranked
+   FROM (
+      SELECT player_id, ranking_date, rank, points,
+             CAST(strftime('%Y', ranking_date) AS INTEGER) AS year,
+             ROW_NUMBER() OVER year_window AS week_from_end,
+             MIN(rank) OVER year_window_all AS best_rank,
+             COUNT(rank) OVER year_window_all AS weeks_ranked
+      FROM rankings
+      WHERE {where}
+      WINDOW year_window AS (
+                PARTITION BY player_id, strftime('%Y', ranking_date)
+                ORDER BY ranking_date DESC
+             ),
+             year_window_all AS (
+                PARTITION BY player_id, strftime('%Y', ranking_date)
+             )
+   )
+   WHERE week_from_end = 1
+"""
+
+def refresh_player_year_ranks(player_ids=None, from_year=None):
+   # Recomputes player_year_rank for the given players, or for all players when None
+   # from_year: only years from this one are recomputed, older ones are kept
+   # Commit is left to the caller, so it can go with the rankings load
+   columns = 'player_id, year, year_end_rank, year_end_date, year_end_points, best_rank, weeks_ranked'
+   
+   # Points are cast only until the column is migrated to INTEGER
+   points = 'points' if rankings_points_migrated() else POINTS_AS_INTEGER
+   
+   delete_where, select_where, year_params = ['1 = 1'], ['1 = 1'], {}
+   if from_year is not None:
+      delete_where.append('year >= :from_year')
+      select_where.append('ranking_date >= :from_date')
+      year_params = {'from_year': from_year, 'from_date': f'{from_year:04d}-01-01'}
+   
+   def refresh(where_players='1 = 1', params={}):
+      params = dict(params, **year_params)
+      db.session.execute(
+         text(f'DELETE FROM player_year_rank WHERE {" AND ".join(delete_where + [where_players])}'),
+         params
+      )
+      db.session.execute(
+         text(
+            f'INSERT INTO player_year_rank ({columns}) '
+            + YEAR_RANKS_SELECT.format(
+               points=points, where=' AND '.join(select_where + [where_players])
+            )
+         ),
+         params
+      )
+   
+   if player_ids is None:
+      refresh()
+      return
+   
+   # Chunks keep the number of SQL variables under SQLite limit
+   player_ids = list(player_ids)
+   for start in range(0, len(player_ids), 500):
+      chunk = player_ids[start:start + 500]
+      params = {f'player_id_{i}': player_id for i, player_id in enumerate(chunk)}
+      placeholders = ', '.join(f':{name}' for name in params)
+      refresh(f'player_id IN ({placeholders})', params)
+
+
+# Best rank of career: lowest rank, first week at it and weeks at it
+BEST_RANKS_SELECT = """
+   SELECT player_id, best_rank, MIN(ranking_date) AS best_rank_date, COUNT(*) AS weeks_at_best
+   FROM (
+      SELECT player_id, ranking_date, rank,
+             MIN(rank) OVER (PARTITION BY player_id) AS best_rank
+      FROM rankings
+      WHERE rank IS NOT NULL AND {where}
+   )
+   WHERE rank = best_rank
+   GROUP BY player_id
+"""
+
+def refresh_player_best_ranks(player_ids=None, after_date=None):
+   # Recomputes best rank columns of the given players, or of all players when None
+   # after_date: ISO date, only weeks after it are read and merged into stored values,
+   # as they are after an incremental rankings load
+   # Commit is left to the caller, so it can go with the rankings load
+   def refresh(where_players='1 = 1', params={}):
+      if after_date is None:
+         db.session.execute(
+            text(
+               'UPDATE players SET best_rank = NULL, best_rank_date = NULL, weeks_at_best = NULL '
+               f'WHERE {where_players}'
+            ),
+            params
+         )
+         db.session.execute(
+            text(f"""
+               UPDATE players SET
+                  best_rank = best.best_rank,
+                  best_rank_date = best.best_rank_date,
+                  weeks_at_best = best.weeks_at_best
+               FROM ({BEST_RANKS_SELECT.format(where=where_players)}) AS best
+               WHERE players.player_id = best.player_id
+            """),
+            params
+         )
+         return
+      
+      # New weeks improve best rank, add weeks at it, or leave it unchanged
+      db.session.execute(
+         text(f"""
+            UPDATE players SET
+               best_rank = best.best_rank,
+               best_rank_date = CASE WHEN players.best_rank = best.best_rank
+                                     THEN players.best_rank_date ELSE best.best_rank_date END,
+               weeks_at_best = CASE WHEN players.best_rank = best.best_rank
+                                    THEN players.weeks_at_best + best.weeks_at_best ELSE best.weeks_at_best END
+            FROM ({BEST_RANKS_SELECT.format(where=f'ranking_date > :after_date AND {where_players}')}) AS best
+            WHERE players.player_id = best.player_id
+              AND (players.best_rank IS NULL OR best.best_rank <= players.best_rank)
+         """),
+         dict(params, after_date=after_date)
+      )
+   
+   if player_ids is None:
+      refresh()
+      return
+   
+   # Chunks keep the number of SQL variables under SQLite limit
+   player_ids = list(player_ids)
+   for start in range(0, len(player_ids), 500):
+      chunk = player_ids[start:start + 500]
+      params = {f'player_id_{i}': player_id for i, player_id in enumerate(chunk)}
+      placeholders = ', '.join(f':{name}' for name in params)
+      refresh(f'player_id IN ({placeholders})', params)
+
+
+# Rebuilds the yearly summary of all players: flask --app main refresh-year-ranks
+@api.cli.command('refresh-year-ranks')
+def refresh_year_ranks_command():
+   start_time = time.monotonic()
+   refresh_player_year_ranks()
+   bump_versions(None)
+   db.session.commit()
+   
+   total = db.session.query(PlayerYearRank).count()
+   click.echo(f'{total} player years refreshed in {time.monotonic() - start_time:.1f}s')
+
+
+# Rebuilds best rank columns of all players: flask --app main refresh-best-ranks
+@api.cli.command('refresh-best-ranks')
+def refresh_best_ranks_command():
+   start_time = time.monotonic()
+   refresh_player_best_ranks()
+   bump_versions(None)
+   db.session.commit()
+   
+   total = db.session.query(Players).filter(Players.best_rank.isnot(None)).count()
+   click.echo(f'{total} players best ranks refreshed in {time.monotonic() - start_time:.1f}s')
+
+
+# -------------------------- RANKINGS IMPORT -------------------------------- #
+
+# Upsert on primary key (player_id, ranking_date)
+RANKINGS_UPSERT = """
+   INSERT INTO rankings (player_id, ranking_date, points, rank) VALUES (?, ?, ?, ?)
+   ON CONFLICT (player_id, ranking_date) DO UPDATE SET
+      points = excluded.points,
+      rank = excluded.rank
+"""
+
+# Bulk load settings, for the import connection only
+IMPORT_PRAGMAS = {
+   'synchronous': 'OFF',
+   'cache_size': '-200000',   # KiB
+   'temp_store': 'MEMORY'
+}
+
+def latest_ranking_date():
+   # Latest week stored, a seek on ix_rankings_ranking_date_rank
+   # Returns ISO date, or None when rankings table is empty
+   latest = db.session.query(func.max(Rankings.ranking_date)).scalar()
+   return latest.isoformat() if latest else None
+
+
+def import_rankings(paths, batch_size=50000, incremental=False):
+   # Streams ranking CSV files into rankings table, upserting batches with executemany
+   # Each file is loaded in one transaction, summaries and best ranks of loaded players
+   # are refreshed
+   # incremental: only weeks newer than the latest stored one are loaded, only
+   # summaries of years having new weeks are recomputed and best ranks are only
+   # compared with new weeks
+   # Returns (rows, players) loaded
+   since = latest_ranking_date() if incremental else None
+   
+   connection = db.session.connection()
+   previous_pragmas = {
+      name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in IMPORT_PRAGMAS
+   }
+   for name, value in IMPORT_PRAGMAS.items():
+      connection.exec_driver_sql(f'PRAGMA {name} = {value}')
+   
+   total_rows = 0
+   player_ids = set()
+   first_date = None
+   
+   try:
+      for path in ranking_files(paths):
+         file_rows = 0
+         start_time = time.monotonic()
+         
+         for rows in batched(iter_ranking_rows(path, since), batch_size):
+            db.session.connection().exec_driver_sql(RANKINGS_UPSERT, rows)
+            player_ids.update(row[0] for row in rows)
+            file_rows += len(rows)
+            
+            batch_first_date = min(row[1] for row in rows)
+            first_date = min(first_date or batch_first_date, batch_first_date)
+         
+         db.session.commit()
+         total_rows += file_rows
+         elapsed = max(time.monotonic() - start_time, 1e-6)
+         click.echo(f'{path}: {file_rows} rows in {elapsed:.1f}s ({file_rows / elapsed:.0f} rows/s)')
+      
+      if not player_ids:
+         return total_rows, 0
+      
+      # Refreshes yearly summaries and best ranks of loaded players,
+      # all at once when most of them
+      # Only years with new weeks change when loading an incremental update, whose
+      # players are refreshed by id without counting players of the whole history
+      from_year = int(first_date[:4]) if incremental else None
+      if incremental:
+         refreshed_ids = player_ids
+      else:
+         total_players = db.session.query(func.count(func.distinct(Rankings.player_id))).scalar()
+         refreshed_ids = None if len(player_ids) > total_players / 2 else player_ids
+      refresh_player_year_ranks(refreshed_ids, from_year)
+      refresh_player_best_ranks(refreshed_ids, since if incremental else None)
+      bump_versions(player_ids if refreshed_ids is not None else None)
+      db.session.commit()
+   
+   except Exception:
+      db.session.rollback()
+      raise
+   
+   finally:
+      connection = db.session.connection()
+      for name, value in previous_pragmas.items():
+         connection.exec_driver_sql(f'PRAGMA {name} = {value}')
+   
+   return total_rows, len(player_ids)
+
+
+# Loads weekly ATP ranking files (ranking_date, rank, player, points):
+# flask --app main import-rankings atp_rankings_00s.csv atp_rankings_10s.csv ...
+# Weekly update, loading only weeks not stored yet:
+# flask --app main import-rankings --incremental rankings/
+@api.cli.command('import-rankings')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--batch-size', default=50000, show_default=True, help='Rows by executemany.')
+@click.option('--incremental', is_flag=True, help='Only load weeks newer than the latest stored.')
+def import_rankings_command(paths, batch_size, incremental):
+   start_time = time.monotonic()
+   if incremental:
+      click.echo(f'Loading weeks after {latest_ranking_date() or "none (empty table)"}')
+   
+   total_rows, total_players = import_rankings(paths, batch_size, incremental)
+   click.echo(
+      f'{total_rows} rankings of {total_players} players imported '
+      f'in {time.monotonic() - start_time:.1f}s'
+   )
+
+
+# --------------------------- RANKINGS EXPORT ------------------------------- #
+
+# Writes rankings (row groups by year) and players for analytics, needs pyarrow:
+# flask --app main export-rankings --format parquet --output export/
+@api.cli.command('export-rankings')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)),
+              default='parquet', show_default=True)
+@click.option('--output', default='export', show_default=True, help='Output directory.')
+def export_rankings_command(export_format, output):
+   start_time = time.monotonic()
+   try:
+      files = export_tables(db.session.connection(), output, export_format)
+   except RuntimeError as e:
+      raise click.ClickException(str(e))
+   
+   for path, total_rows in files.items():
+      click.echo(f'{path}: {total_rows} rows')
+   click.echo(f'Exported in {time.monotonic() - start_time:.1f}s')
+
+
+# ---------------------------- MIGRATIONS ----------------------------------- #
+
+def rankings_points_migrated():
+   # Whether rankings.points column has already been migrated to INTEGER
+   with db.engine.connect() as connection:
+      for row in connection.exec_driver_sql('PRAGMA table_info(rankings)'):
+         if row[1] == 'points':
+            return row[2].upper() == 'INTEGER'
+   return True
+
+
+def migrate_rankings_points():
+   # Converts rankings.points from VARCHAR with 'unknown' to INTEGER with NULL
+   # SQLite cannot change the type of a column, so the table is rebuilt
+   # Returns (rankings migrated, unknown points set to NULL)
+   # Same table with new name, players is copied along as target of its foreign key
+   metadata = MetaData()
+   Players.__table__.to_metadata(metadata)
+   new_table = Rankings.__table__.to_metadata(metadata, name='rankings_new')
+   
+   with db.engine.begin() as connection:
+      connection.exec_driver_sql('DROP TABLE IF EXISTS rankings_new')
+      connection.execute(CreateTable(new_table))
+      
+      # Keeps numbers, any other value ('unknown', '') becomes NULL
+      connection.exec_driver_sql(f"""
+         INSERT INTO rankings_new (player_id, ranking_date, points, rank)
+         SELECT player_id, ranking_date, {POINTS_AS_INTEGER}, rank
+         FROM rankings
+      """)
+      connection.exec_driver_sql('DROP TABLE rankings')
+      connection.exec_driver_sql('ALTER TABLE rankings_new RENAME TO rankings')
+      
+      # Indexes went away with old table
+      for index in Rankings.__table__.indexes:
+         index.create(connection, checkfirst=True)
+      
+      total, unknown = connection.exec_driver_sql(
+         'SELECT COUNT(*), COUNT(*) - COUNT(points) FROM rankings'
+      ).one()
+      
+      # Summaries refreshed before this version may hold 'unknown' points
+      connection.exec_driver_sql(
+         "UPDATE player_year_rank SET year_end_points = NULL "
+         "WHERE typeof(year_end_points) NOT IN ('integer', 'null')"
+      )
+      
+      # Points of cached responses change from text to numbers, in players and leaderboards
+      connection.exec_driver_sql(
+         'INSERT INTO counters (name, value) VALUES (?, 1) '
+         'ON CONFLICT (name) DO UPDATE SET value = value + 1',
+         [('players_generation',), ('rankings_version',)]
+      )
+   
+   return total, unknown
+
+
+# Runs the points migration by hand: flask --app main migrate-rankings-points
+# init-database runs it as well
+@api.cli.command('migrate-rankings-points')
+def migrate_rankings_points_command():
+   if rankings_points_migrated():
+      click.echo('rankings.points is already INTEGER')
+      return
+   
+   start_time = time.monotonic()
+   total, unknown = migrate_rankings_points()
+   click.echo(
+      f'{total} rankings migrated, {unknown} unknown points set to NULL '
+      f'in {time.monotonic() - start_time:.1f}s'
+   )
+
+
+# Stores players countries as lowercase ISO alpha-2, as returned by the API:
+# flask --app main normalize-countries
+# ATP data uses IOC codes (e.g. GER, SUI), Wikidata and frontend use alpha-2
+# Codes without ISO country (e.g. URS, YUG) are left as they are
+@api.cli.command('normalize-countries')
+def normalize_countries_command():
+   countries = [
+      country for (country,) in
+      db.session.query(Players.country).filter(Players.country.isnot(None)).distinct()
+   ]
+   
+   changes = []
+   unknown_codes = []
+   for country in countries:
+      alpha2 = to_alpha2(country)
+      if alpha2 is None and country not in ['', 'unknown']:
+         unknown_codes.append(country)
+      elif alpha2 and alpha2 != country:
+         changes.append((alpha2, country))
+   
+   updated = 0
+   if changes:
+      updated = db.session.connection().exec_driver_sql(
+         'UPDATE players SET country = ? WHERE country = ?', changes
+      ).rowcount
+      bump_versions(None)
+   db.session.commit()
+   
+   click.echo(f'{updated} players updated, {len(changes)} codes converted')
+   if unknown_codes:
+      click.echo(f'Codes without ISO country left as they are: {", ".join(sorted(unknown_codes))}')
+
+
+# ------------------------- ENRICHMENT WORKER ------------------------------- #
+
+# Birth date stored for players whose real birth date is unknown
+SENTINEL_BIRTH_DATE = date(1800, 1, 1)
+
+def players_missing_data():
+   # Filter for players with values that can be searched in Wikidata
+   return or_(
+      Players.wikidata_id.is_(None),
+      Players.wikidata_id.in_(['', 'unknown']),
+      Players.country.is_(None),
+      Players.country.in_(['', 'unknown']),
+      Players.birth_date.is_(None),
+      Players.birth_date == SENTINEL_BIRTH_DATE
+   )
+
+
+def enqueue_enrichment_jobs(limit):
+   # Registers pending jobs for players with missing data and no job yet
+   # Most recent players first, as they are shown first in the players list
+   candidates = (
+      db.session.query(Players.player_id)
+      .outerjoin(EnrichmentJobs, EnrichmentJobs.player_id == Players.player_id)
+      .filter(EnrichmentJobs.player_id.is_(None))
+      .filter(players_missing_data())
+      .order_by(desc(Players.birth_date))
+      .limit(limit)
+      .all()
+   )
+   
+   for (player_id,) in candidates:
+      db.session.add(EnrichmentJobs(player_id=player_id))
+   
+   # Failed jobs start over once their cooldown is over, e.g. after a Wikidata outage
+   db.session.execute(
+      update(EnrichmentJobs)
+      .where(EnrichmentJobs.status == 'failed')
+      .where(EnrichmentJobs.next_attempt_at <= datetime.utcnow())
+      .values(status='pending', attempts=0, next_attempt_at=None),
+      execution_options={'synchronize_session': False}
+   )
+   
+   db.session.commit()
+   return len(candidates)
+
+
+def claim_enrichment_jobs(worker_name, batch_size):
+   # Marks a batch of pending jobs as running for this worker
+   # A single UPDATE keeps claims atomic between several workers
+   # Jobs waiting for a retry are left until their next_attempt_at
+   pending_ids = (
+      select(EnrichmentJobs.player_id)
+      .where(EnrichmentJobs.status == 'pending')
+      .where(or_(EnrichmentJobs.next_attempt_at.is_(None), EnrichmentJobs.next_attempt_at <= datetime.utcnow()))
+      .order_by(EnrichmentJobs.updated_at)
+      .limit(batch_size)
+   )
+   db.session.execute(
+      update(EnrichmentJobs)
+      .where(EnrichmentJobs.player_id.in_(pending_ids))
+      .where(EnrichmentJobs.status == 'pending')
+      .values(status='running', worker=worker_name, updated_at=datetime.utcnow()),
+      execution_options={'synchronize_session': False}
+   )
+   db.session.commit()
+   
+   return EnrichmentJobs.query.filter_by(status='running', worker=worker_name).all()
+
+
+def requeue_stale_enrichment_jobs():
+   # Returns to pending the jobs left running by a stopped worker
+   timeout = timedelta(seconds=current_app.config['ENRICHMENT_JOB_TIMEOUT'])
+   db.session.execute(
+      update(EnrichmentJobs)
+      .where(EnrichmentJobs.status == 'running')
+      .where(EnrichmentJobs.updated_at < datetime.utcnow() - timeout)
+      .values(status='pending', worker=None),
+      execution_options={'synchronize_session': False}
+   )
+   db.session.commit()
+
+
+def player_enrichment_request(player_object):
+   # Composes the values to search in Wikidata for a player
+   
+   # Composes complete player name
+   name_last = (player_object.name_last or '').strip()
+   if player_object.name_first in [None, '', 'unknown']:
+      player_name = name_last
+   else:
+      player_name = player_object.name_first.strip() + ' ' + name_last
+   
+   return {
+      'player_id': player_object.player_id,
+      'player_name': player_name,
+      'wikidata_id': None if player_object.wikidata_id in [None, '', 'unknown'] else player_object.wikidata_id,
+      'needs_country': player_object.country in [None, '', 'unknown'],
+      'needs_birth_date': player_object.birth_date in [None, SENTINEL_BIRTH_DATE]
+   }
+
+
+def apply_enrichment(player_object, values):
+   # Sets values found in Wikidata into player object
+   # Returns True when any value has been updated
+   updated = False
+   for field in ['wikidata_id', 'country', 'birth_date']:
+      if values.get(field):
+         setattr(player_object, field, values[field])
+         updated = True
+   return updated
+
+
+def run_enrichment_batch(worker_name):
+   # Enriches a batch of claimed jobs, returns number of processed jobs
+   import asyncio
+   from Services.wikidata_async_services import enrich_players_async
+   
+   jobs = claim_enrichment_jobs(worker_name, current_app.config['ENRICHMENT_WORKER_BATCH_SIZE'])
+   if not jobs:
+      return 0
+   
+   players = Players.query.filter(Players.player_id.in_([job.player_id for job in jobs])).all()
+   players_by_id = {player_object.player_id: player_object for player_object in players}
+   
+   # Searches all players of the batch concurrently
+   results = asyncio.run(enrich_players_async(
+      [player_enrichment_request(player_object) for player_object in players],
+      concurrency=current_app.config['ENRICHMENT_CONCURRENCY']
+   ))
+   
+   # Writes back the whole batch, players and jobs, in one transaction
+   updated_ids = []
+   for job in jobs:
+      values = results.get(job.player_id, {})
+      
+      if 'error' in values:
+         current_app.logger.error(f"Error enriching player {job.player_id}: {values['error']}")
+         job.attempts += 1
+         job.last_error = values['error'][:255]
+         
+         # Retries with exponential backoff, then gives up until the cooldown is over
+         if job.attempts >= current_app.config['ENRICHMENT_MAX_ATTEMPTS']:
+            job.status = 'failed'
+            delay = current_app.config['ENRICHMENT_FAILED_COOLDOWN']
+         else:
+            job.status = 'pending'
+            delay = current_app.config['ENRICHMENT_RETRY_INTERVAL'] * 2 ** job.attempts
+         job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+      
+      else:
+         player_object = players_by_id.get(job.player_id)
+         if player_object:
+            if apply_enrichment(player_object, values):
+               bump_versions([player_object.player_id])
+               updated_ids.append(player_object.player_id)
+         job.status = 'done'
+         job.last_error = None
+         job.next_attempt_at = None
+      
+      job.worker = None
+      job.updated_at = datetime.utcnow()
+   
+   # Commits changes into database
+   db.session.commit()
+   invalidate_player_fragments(updated_ids)
+   
+   return len(jobs)
+
+
+def run_enrichment_worker(app, stop_event):
+   # Worker loop: enqueues players with missing data and processes their jobs
+   worker_name = f'{socket.gethostname()}:{os.getpid()}'[:40]
+   configure_wikidata(app)
+   
+   with app.app_context():
+      while not stop_event.is_set():
+         processed = 0
+         try:
+            # Jobs of workers that died mid-batch, also when another worker replaced them
+            requeue_stale_enrichment_jobs()
+            enqueue_enrichment_jobs(current_app.config['ENRICHMENT_WORKER_BATCH_SIZE'])
+            processed = run_enrichment_batch(worker_name)
+            
+         except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Error in enrichment worker: {str(e)}', exc_info=True)
+            
+         finally:
+            db.session.remove()
+         
+         # Sleeps only when there is nothing left to do
+         if not processed:
+            stop_event.wait(current_app.config['ENRICHMENT_WORKER_INTERVAL'])
+
+
+def start_enrichment_worker(app):
+   # Starts the worker in a daemon thread next to the web server
+   stop_event = threading.Event()
+   thread = threading.Thread(
+      target=run_enrichment_worker,
+      args=(app, stop_event),
+      name='enrichment-worker',
+      daemon=True
+   )
+   thread.start()
+   return stop_event
+
+
+# Runs the worker as a separate process: flask --app main enrichment-worker
+@api.cli.command('enrichment-worker')
+def enrichment_worker_command():
+   run_enrichment_worker(current_app._get_current_object(), threading.Event())
+
+
+# Enriches the whole players table offline: flask --app main enrich
+# Walks players needing data in player_id order, chunk by chunk, and saves
+# the last committed player_id in a checkpoint file to resume after a stop
+@api.cli.command('enrich')
+@click.option('--chunk-size', default=200, show_default=True, help='Players per chunk and transaction.')
+@click.option('--concurrency', default=None, type=int, help='Concurrent Wikidata lookups.')
+@click.option('--checkpoint', default='enrich_checkpoint.json', show_default=True, help='Checkpoint file.')
+@click.option('--restart', is_flag=True, help='Ignores checkpoint and starts from the first player.')
+@click.option('--retry-done', is_flag=True, help='Also searches players already searched by the worker.')
+def enrich_command(chunk_size, concurrency, checkpoint, restart, retry_done):
+   import asyncio
+   from Services.wikidata_services import get_claims_cache, get_wikidata_client
+   from Services.wikidata_async_services import enrich_players_async
+   
+   configure_wikidata(current_app)
+   concurrency = concurrency or current_app.config['ENRICHMENT_CONCURRENCY']
+   
+   # Resumes from checkpoint
+   state = {'last_player_id': '', 'processed': 0, 'updated': 0}
+   if not restart and os.path.exists(checkpoint):
+      with open(checkpoint) as checkpoint_file:
+         state.update(json.load(checkpoint_file))
+      click.echo(f"Resuming after player {state['last_player_id']} ({state['processed']} players processed)")
+   
+   client = get_wikidata_client()
+   cache = get_claims_cache()
+   start_time = time.monotonic()
+   start_requests = client.requests_count
+   start_hits, start_misses = cache.hits, cache.misses
+   processed = 0
+   
+   while True:
+      
+      # Next chunk of players needing data, keyset ordered
+      query = (
+         db.session.query(Players)
+         .outerjoin(EnrichmentJobs, EnrichmentJobs.player_id == Players.player_id)
+         .filter(Players.player_id > state['last_player_id'])
+         .filter(players_missing_data())
+      )
+      if not retry_done:
+         query = query.filter(or_(EnrichmentJobs.player_id.is_(None), EnrichmentJobs.status == 'pending'))
+      players = query.order_by(Players.player_id).limit(chunk_size).all()
+      
+      if not players:
+         break
+      
+      # Searches all players of the chunk concurrently
+      results = asyncio.run(enrich_players_async(
+         [player_enrichment_request(player_object) for player_object in players],
+         concurrency=concurrency
+      ))
+      
+      last_player_id = players[-1].player_id
+      
+      # Writes back the chunk in one transaction, jobs included
+      # so the worker does not search these players again
+      updated = 0
+      job_rows = []
+      for player_object in players:
+         values = results.get(player_object.player_id, {})
+         if apply_enrichment(player_object, values):
+            bump_versions([player_object.player_id])
+            updated += 1
+         job_rows.append({
+            'player_id': player_object.player_id,
+            'status': 'pending' if 'error' in values else 'done',
+            'last_error': values.get('error', '')[:255] or None,
+            'updated_at': datetime.utcnow()
+         })
+      
+      insert_jobs = sqlite_insert(EnrichmentJobs).values(job_rows)
+      db.session.execute(insert_jobs.on_conflict_do_update(
+         index_elements=[EnrichmentJobs.player_id],
+         set_={
+            'status': insert_jobs.excluded.status,
+            'last_error': insert_jobs.excluded.last_error,
+            'updated_at': insert_jobs.excluded.updated_at,
+            'worker': None
+         }
+      ))
+      db.session.commit()
+      db.session.expunge_all()
+      
+      # Saves checkpoint once chunk is committed
+      processed += len(players)
+      state['last_player_id'] = last_player_id
+      state['processed'] += len(players)
+      state['updated'] += updated
+      with open(checkpoint, 'w') as checkpoint_file:
+         json.dump(state, checkpoint_file)
+      
+      # Reports throughput
+      elapsed = max(time.monotonic() - start_time, 1e-6)
+      hits, misses = cache.hits - start_hits, cache.misses - start_misses
+      click.echo(
+         f"{state['processed']} players processed, {state['updated']} updated | "
+         f"{processed / elapsed:.1f} players/s, "
+         f"{(client.requests_count - start_requests) / elapsed:.1f} requests/s, "
+         f"cache hit rate {hits / (hits + misses) if hits + misses else 0:.0%}"
+      )
+   
+   # Finished, next run starts from the beginning
+   if os.path.exists(checkpoint):
+      os.remove(checkpoint)
+   click.echo(f"Enrichment finished: {state['processed']} players processed, {state['updated']} updated")
+
+
 # ------------------------------- ROUTES ------------------------------------ #
 
 # GET all players route handle
-@app.route('/players', methods=['GET'])
+@api.route('/players', methods=['GET'])
 def get_players():
    try:
       
@@ -216,6 +1537,10 @@ def get_players():
       page = int(request.args.get('page', 1))     
       per_page = int(request.args.get('per_page', 10))
       search_name_last = request.args.get('search_name_last', '').strip()
+      search = request.args.get('search', '').strip()
+      cursor = request.args.get('cursor', '').strip()
+      with_count = request.args.get('count', 'true').lower() != 'false'
+      sort = request.args.get('sort', 'birth_date').strip()
       
       if page < 1 : 
          page = 1
@@ -223,109 +1548,150 @@ def get_players():
       if (per_page < 1 or per_page > 30): 
          per_page = 10
       
+      if sort not in PLAYERS_SORTS:
+         sort = 'birth_date'
+      
+      # Cursor of previous page, with its last player
+      if cursor:
+         try:
+            cursor_values = decode_cursor(cursor)
+            sort = cursor_values.get('sort', 'birth_date')
+            if sort not in PLAYERS_SORTS:
+               raise ValueError(f'unknown sort {sort}')
+            after_value = cursor_values[sort]
+            if after_value is not None:
+               after_value = date.fromisoformat(after_value) if sort == 'birth_date' else int(after_value)
+            after_player_id = str(cursor_values['player_id'])
+            page = int(cursor_values['page']) + 1
+         except (KeyError, TypeError, ValueError) as e:
+            return jsonify({
+               'status': 'error',
+               'message': f'Invalid cursor: {str(e)}'
+            }), 400
+      
       # Retrieves all players in database
       base_query = db.session.query(Players)
 
-      # Filters by search_name_last if provided
+      # Filters by search_name_last if provided, search in any name if provided
       if search_name_last:
-         base_query = base_query.filter(Players.name_last.ilike(f'%{search_name_last}%'))
+         base_query = filter_players_by_search(base_query, search_name_last, ['name_last'])
+      if search:
+         base_query = filter_players_by_search(base_query, search, ['name_first', 'name_last', 'fullname'])
 
-      # Calculates number of filtered players
-      total_players = base_query.count()
+      # Calculates number of filtered players, unless count=false
+      # Unfiltered: counter maintained by POST and DELETE
+      # Filtered: cached for a few seconds, so typing a search does not count on every key
+      total_players = None
+      total_pages = None
       
-      # Calculates number of pages for all filtered players
-      total_pages = (total_players + per_page - 1) // per_page
+      if with_count and (search_name_last or search):
+         count_key = (normalize_search(search_name_last), normalize_search(search))
+         total_players = players_count_cache.get(count_key)
+         if total_players is None:
+            total_players = base_query.count()
+            players_count_cache.set(count_key, total_players)
       
-      if page > total_pages: 
-         page = total_pages if total_pages > 0 else 1
-     
-      # Retrieves filtered players for current page
-      query = (
-         base_query
-         .order_by(desc(Players.birth_date))
-         .offset((page - 1) * per_page)
-         .limit(per_page)
-      )
-
-      # Query: retrieves players with their best_rank for current page
-      # query = (
-      #    select(Players, func.min(Rankings.rank).label('best_rank'))
-      #    .outerjoin(Rankings, Players.player_id == Rankings.player_id)
-      #    .filter(Players.player_id.in_(subquery))
-      #    .group_by(Players)
-      #    .order_by((Players.birth_date))
-      # )
+      elif with_count:
+         total_players = get_counter('players', lambda: db.session.query(Players).count())
       
-      # List of players objects
-      players_objects_list = query.all()
+      if with_count:
+         # Calculates number of pages for all filtered players
+         total_pages = (total_players + per_page - 1) // per_page
+         
+         if page > total_pages and not cursor: 
+            page = total_pages if total_pages > 0 else 1
       
-      # Converts to list of dicts
-      players_list_in_page = []
+      # Players are ordered by birth date, most recent first, or by best rank,
+      # unknown values last
+      sort_column, descending = PLAYERS_SORTS[sort]
+      if descending:
+         order = (desc(sort_column), desc(Players.player_id))
+      else:
+         order = (sort_column.asc().nulls_last(), Players.player_id)
       
-      # Composes dict for each player and searches missings in Wikidata
-      #for player, best_rank in players_page:
-      for player_object in players_objects_list:
-         
-         player = player_object.to_dict()         
+      # Retrieves filtered players for current page
+      # One extra player tells whether there is a next page
+      if cursor:
+         # Keyset: continues after last player of previous page,
+         # so any page costs the same as the first one
+         if after_value is not None:
+            after_key = tuple_(after_value, after_player_id)
+            players_objects_list = (
+               base_query
+               .filter(sort_column.isnot(None))
+               .filter(
+                  tuple_(sort_column, Players.player_id) < after_key if descending
+                  else tuple_(sort_column, Players.player_id) > after_key
+               )
+               .order_by(*order)
+               .limit(per_page + 1)
+               .all()
+            )
+            after_player_id = None
+         else:
+            players_objects_list = []
          
-         # Controls if commit is needed
-         update_flag = False    
+         # Players without value come after all the others
+         if len(players_objects_list) <= per_page:
+            null_query = base_query.filter(sort_column.is_(None))
+            if after_player_id:
+               null_query = null_query.filter(
+                  Players.player_id < after_player_id if descending
+                  else Players.player_id > after_player_id
+               )
+            players_objects_list += (
+               null_query
+               .order_by(desc(Players.player_id) if descending else Players.player_id)
+               .limit(per_page + 1 - len(players_objects_list))
+               .all()
+            )
+      
+      else:
+         players_objects_list = (
+            base_query
+            .order_by(*order)
+            .offset((page - 1) * per_page)
+            .limit(per_page + 1)
+            .all()
+         )
+      
+      has_next_page = len(players_objects_list) > per_page
+      players_objects_list = players_objects_list[:per_page]
+      
+      # Cursor to next page
+      next_cursor = None
+      if has_next_page:
+         last_player = players_objects_list[-1]
+         last_value = getattr(last_player, sort)
+         next_cursor = encode_cursor({
+            'sort': sort,
+            sort: last_value.isoformat() if isinstance(last_value, date) else last_value,
+            'player_id': last_player.player_id,
+            'page': page
+         })
 
-         # Gets wikidata id
-         if player['wikidata_id'] == '-':
-            
-            # Composes complete player name
-            if player['name_first'] == '-':
-               player_name = player['name_last'].strip()
-            else:
-               player_name = player['name_first'].strip() + ' ' + player['name_last'].strip()
-               
-            wikidata_id = get_wikidata_id(player_name)
-            if wikidata_id:
-               player['wikidata_id'] = wikidata_id
-               player_object.wikidata_id = wikidata_id 
-               update_flag = True
-         
-         # Gets country
-         if player['wikidata_id'] != '-' and player['country'] == 'unknown':
-            
-            country = get_wikidata_country(player['wikidata_id'])
-            if country: 
-               player['country'] = country
-               player_object.country = country
-               update_flag = True
-               
-         # Gets birth_date
-         if player['wikidata_id'] != '-' and \
-            ( player['birth_date'] == None or player['birth_date'] == '' or player['birth_date'] == '01-01-1800'):
-            
-            birth_date = get_wikidata_birth_date(player['wikidata_id'])
-            if birth_date: 
-               player['birth_date'] = birth_date.strftime('%d-%m-%Y') 
-               player_object.birth_date = birth_date
-               update_flag = True
-            
-         players_list_in_page.append(player)
-         
-         # Commits changes into database
-         if update_flag:
-            db.session.commit()
-               
+      # Serialized players, mostly from cache
+      # Missing values are completed in Wikidata by the enrichment worker
+      players_fragments = player_fragments(players_objects_list)
       
       response_object = {
          'status':'success',
          'message': 'Players have been retrieved successfully!',
-         'players': players_list_in_page,
          'total_players': total_players, 
          'page': page,
-         'pages': total_pages
+         'pages': total_pages,
+         'next_cursor': next_cursor
       } 
       
-      return jsonify(response_object), 200
+      # Adds players to serialized response without serializing them again
+      body = current_app.json.dumps(response_object)
+      body = body[:-1] + ', "players": [' + ', '.join(players_fragments) + ']}'
+      
+      return Response(body, mimetype=current_app.json.mimetype), 200
    
    except Exception as e:
       error_msg = f'Error retrieving players: {str(e)}'
-      app.logger.error(error_msg, exc_info=True)
+      current_app.logger.error(error_msg, exc_info=True)
       return jsonify({
          'status': 'error', 
          'message': error_msg
@@ -333,7 +1699,8 @@ def get_players():
       
       
 # GET player by id route handle
-@app.route('/players/<string:player_id>', methods=['GET'])
+@api.route('/players/<string:player_id>', methods=['GET'])
+@cached_response(player_versions)
 def get_player(player_id):
    try:
       player_object = Players.query.filter_by(player_id=player_id).first()
@@ -359,7 +1726,82 @@ def get_player(player_id):
 
    except Exception as e:
       error_msg = f'Error retrieving player {player_id}: {str(e)}'
-      app.logger.error(error_msg, exc_info=True)
+      current_app.logger.error(error_msg, exc_info=True)
+      
+      return jsonify({
+         'status': 'error',
+         'message': error_msg
+      }), 500
+
+
+# GET player ranking history route handle
+# from, to: dates YYYY-MM-DD, resolution: week, month or year,
+# max_points: reduces points keeping the shape of the chart (LTTB)
+@api.route('/players/<string:player_id>/rankings', methods=['GET'])
+@cached_response(player_versions)
+def get_player_rankings(player_id):
+   try:
+      
+      # Gets and validates arguments
+      resolution = request.args.get('resolution', 'week').strip()
+      try:
+         date_from = request.args.get('from', '').strip()
+         date_from = date.fromisoformat(date_from) if date_from else None
+         date_to = request.args.get('to', '').strip()
+         date_to = date.fromisoformat(date_to) if date_to else None
+         max_points = request.args.get('max_points', '').strip()
+         max_points = int(max_points) if max_points else None
+         
+         if resolution not in RANKINGS_RESOLUTIONS:
+            raise ValueError(f'resolution must be one of {", ".join(RANKINGS_RESOLUTIONS)}')
+         if max_points is not None and max_points < 3:
+            raise ValueError('max_points must be 3 or more')
+      
+      except ValueError as e:
+         return jsonify({
+            'status': 'error',
+            'message': f'Invalid arguments: {str(e)}'
+         }), 400
+      
+      player_object = db.session.get(Players, player_id)
+      
+      if not player_object:
+         error_msg = f'Player id {player_id} not found in database.'
+         print(error_msg)
+         return jsonify({
+            'status': 'error',
+            'message': error_msg
+         }), 404
+      
+      history = player_object.get_rankings_history(date_from, date_to, resolution)
+      
+      # Reduces to chart points
+      if max_points:
+         kept = lttb([(row[0].toordinal(), row[1]) for row in history], max_points)
+         history = [history[index] for index in kept]
+      
+      rankings = [
+         {
+            'ranking_date': ranking_date.strftime('%d-%m-%Y'),
+            'rank': rank,
+            'best_rank': best_rank,
+            'points': points if points is not None else '-'
+         }
+         for ranking_date, rank, best_rank, points in history
+      ]
+      
+      response_object = {
+         'status': 'success',
+         'message': f'Rankings of player {player_id} have been retrieved successfully!',
+         'resolution': resolution,
+         'rankings': rankings
+      }
+      
+      return jsonify(response_object), 200
+   
+   except Exception as e:
+      error_msg = f'Error retrieving rankings of player {player_id}: {str(e)}'
+      current_app.logger.error(error_msg, exc_info=True)
       
       return jsonify({
          'status': 'error',
@@ -368,7 +1810,7 @@ def get_player(player_id):
 
 
 # POST player route handle
-@app.route('/players', methods=['POST'])
+@api.route('/players', methods=['POST'])
 def add_player():
    try:
       data = request.get_json()
@@ -382,17 +1824,21 @@ def add_player():
          name_last=data.get('name_last'),
          hand=normalize_values_into_db('hand', data.get('hand')),
          birth_date=normalize_values_into_db('birth_date', data.get('birth_date')),
-         country=data.get('country'),
+         country=normalize_values_into_db('country', data.get('country')),
          height=normalize_values_into_db('height', data.get('height')),
          wikidata_id=normalize_values_into_db('wikidata_id', data.get('wikidata_id')),
          fullname=data.get('fullname')
       )
       
-      # Adds player
+      # Adds player and counts it
       db.session.add(new_player)
+      increment_counter('players', 1)
+      bump_versions([new_player.player_id])
       
       # Commits changes into database
       db.session.commit()
+      players_count_cache.clear()
+      invalidate_player_fragments([data.get('player_id')])
       
       response_object = {
          'status': 'success', 
@@ -404,7 +1850,7 @@ def add_player():
    except Exception as e:
       db.session.rollback()
       error_msg = f'Error adding new player: {str(e)}'
-      app.logger.error(error_msg, exc_info=True)
+      current_app.logger.error(error_msg, exc_info=True)
       
       return jsonify({
          'status': 'error', 
@@ -412,7 +1858,7 @@ def add_player():
       }), 500
       
 # DELETE player route handle
-@app.route('/players/<string:player_id>', methods=['DELETE'])
+@api.route('/players/<string:player_id>', methods=['DELETE'])
 def delete_player(player_id):
    try:
       player = Players.query.filter_by(player_id=player_id).first()
@@ -423,11 +1869,16 @@ def delete_player(player_id):
             'message': f'Player id {player_id} not found in database.'
          }), 404
 
-      # Deletes player
+      # Deletes player and its pending enrichment, and discounts it
+      EnrichmentJobs.query.filter_by(player_id=player_id).delete()
       db.session.delete(player)
+      increment_counter('players', -1)
+      bump_versions([player_id])
       
       # Commits changes into database
       db.session.commit()
+      players_count_cache.clear()
+      invalidate_player_fragments([player_id])
       
       response_object = {
          'status': 'success',
@@ -438,7 +1889,7 @@ def delete_player(player_id):
 
    except Exception as e:
       error_msg = f'Error deleting player: {str(e)}'
-      app.logger.error(error_msg, exc_info=True)
+      current_app.logger.error(error_msg, exc_info=True)
       
       return jsonify({
          'status': 'error',
@@ -446,7 +1897,7 @@ def delete_player(player_id):
       }), 500
 
 # PUT player by id route handle
-@app.route('/players/<string:player_id>', methods=['PUT'])
+@api.route('/players/<string:player_id>', methods=['PUT'])
 def update_player(player_id):
    try:
       player = Players.query.filter_by(player_id=player_id).first()
@@ -469,17 +1920,26 @@ def update_player(player_id):
       if 'birth_date' in data:
          player.birth_date = normalize_values_into_db('birth_date', data['birth_date'])
       if 'country' in data:
-         player.country = data['country']
+         player.country = normalize_values_into_db('country', data['country'])
       if 'height' in data:
          player.height = normalize_values_into_db('height', data['height'])
       if 'wikidata_id' in data:
          player.wikidata_id = normalize_values_into_db('wikidata_id', data['wikidata_id'])
+         
+         # Lets the enrichment worker search again with the new wikidata id
+         EnrichmentJobs.query.filter_by(player_id=player_id).delete()
       if 'fullname' in data:
          player.fullname = data['fullname']
+      
+      bump_versions([player_id])
 
       # Commits changes into database
       db.session.commit()
       
+      # Last name may have changed
+      players_count_cache.clear()
+      invalidate_player_fragments([player_id])
+      
       response_object = {
          'status': 'success',
          'message': f'Player id {player_id} has been successfully updated.'
@@ -490,7 +1950,7 @@ def update_player(player_id):
    except Exception as e:
       db.session.rollback()
       error_msg = f'Error updating player: {str(e)}'
-      app.logger.error(error_msg, exc_info=True)
+      current_app.logger.error(error_msg, exc_info=True)
       
       return jsonify({
          'status': 'error',
@@ -498,6 +1958,379 @@ def update_player(player_id):
       }), 500
 
 
+# GET in-process caches metrics route handle
+@api.route('/metrics/cache', methods=['GET'])
+def get_cache_metrics():
+   return jsonify({
+      'status': 'success',
+      'message': 'Cache metrics have been retrieved successfully!',
+      'players_fragments': players_fragments_cache.stats()
+   }), 200
+
+
+# GET ranking trajectories comparison route handle
+# player_ids: comma separated ids
+# align: date, age (weeks since birth) or career (weeks since first ranking)
+# Columnar response: one x array and one rank array by player, null when not ranked
+@api.route('/rankings/compare', methods=['GET'])
+@cached_response(rankings_versions)
+def compare_rankings():
+   try:
+      
+      # Gets and validates arguments
+      player_ids = list(dict.fromkeys(
+         player_id.strip() for player_id in request.args.get('player_ids', '').split(',')
+         if player_id.strip()
+      ))
+      align = request.args.get('align', 'date').strip()
+      
+      error_msg = None
+      if not player_ids:
+         error_msg = 'player_ids is required'
+      elif len(player_ids) > current_app.config['RANKINGS_COMPARE_MAX_PLAYERS']:
+         error_msg = f'at most {current_app.config["RANKINGS_COMPARE_MAX_PLAYERS"]} player_ids'
+      elif align not in ['date', 'age', 'career']:
+         error_msg = 'align must be one of date, age, career'
+      
+      if error_msg:
+         return jsonify({
+            'status': 'error',
+            'message': f'Invalid arguments: {error_msg}'
+         }), 400
+      
+      players = {
+         player.player_id: player
+         for player in Players.query.filter(Players.player_id.in_(player_ids))
+      }
+      missing_ids = [player_id for player_id in player_ids if player_id not in players]
+      
+      if missing_ids:
+         error_msg = f'Player ids {", ".join(missing_ids)} not found in database.'
+         print(error_msg)
+         return jsonify({
+            'status': 'error',
+            'message': error_msg
+         }), 404
+      
+      # Rankings of all players in one query, in date order
+      query = db.session.execute(
+         select(Rankings.player_id, Rankings.ranking_date, Rankings.rank)
+         .where(Rankings.player_id.in_(player_ids), Rankings.rank.isnot(None))
+         .order_by(Rankings.player_id, Rankings.ranking_date)
+      )
+      
+      # Position of each week on x axis, by player
+      # ISO dates, so echarts reads them as time axis
+      ranks_by_player = {player_id: {} for player_id in player_ids}
+      first_dates = {}
+      for player_id, ranking_date, rank in query:
+         if align == 'date':
+            x = ranking_date.isoformat()
+         elif align == 'age':
+            # Players with unknown birth date, also stored as SENTINEL_BIRTH_DATE, have no age
+            birth_date = players[player_id].birth_date
+            if birth_date in [None, SENTINEL_BIRTH_DATE]:
+               continue
+            x = (ranking_date - birth_date).days // 7
+         else:
+            first_date = first_dates.setdefault(player_id, ranking_date)
+            x = (ranking_date - first_date).days // 7
+         ranks_by_player[player_id][x] = rank
+      
+      x_values = sorted(set().union(*ranks_by_player.values()))
+      
+      series = [
+         {
+            'player_id': player_id,
+            'name_first': players[player_id].name_first,
+            'name_last': players[player_id].name_last,
+            'ranks': [ranks_by_player[player_id].get(x) for x in x_values]
+         }
+         for player_id in player_ids
+      ]
+      
+      response_object = {
+         'status': 'success',
+         'message': f'Rankings of players {", ".join(player_ids)} have been compared successfully!',
+         'align': align,
+         'x': x_values,
+         'series': series
+      }
+      
+      return jsonify(response_object), 200
+   
+   except Exception as e:
+      error_msg = f'Error comparing rankings: {str(e)}'
+      current_app.logger.error(error_msg, exc_info=True)
+      
+      return jsonify({
+         'status': 'error',
+         'message': error_msg
+      }), 500
+
+
+# GET rankings export route handle
+# format: parquet or arrow (IPC stream), streamed year by year
+@api.route('/export/rankings', methods=['GET'])
+def export_rankings():
+   export_format = request.args.get('format', 'parquet').strip()
+   
+   if export_format not in EXPORT_FORMATS:
+      return jsonify({
+         'status': 'error',
+         'message': f'Invalid arguments: format must be one of {", ".join(EXPORT_FORMATS)}'
+      }), 400
+   
+   try:
+      chunks = stream_rankings(db.session.connection(), export_format)
+      first_chunk = next(chunks)   # fails here, before streaming, when pyarrow is missing
+   
+   except RuntimeError as e:
+      return jsonify({
+         'status': 'error',
+         'message': str(e)
+      }), 501
+   
+   except Exception as e:
+      error_msg = f'Error exporting rankings: {str(e)}'
+      current_app.logger.error(error_msg, exc_info=True)
+      
+      return jsonify({
+         'status': 'error',
+         'message': error_msg
+      }), 500
+   
+   def generate():
+      yield first_chunk
+      yield from chunks
+   
+   extension = EXPORT_FORMATS[export_format]['extension']
+   return Response(
+      stream_with_context(generate()),
+      mimetype=EXPORT_FORMATS[export_format]['mimetype'],
+      headers={'Content-Disposition': f'attachment; filename=rankings.{extension}'}
+   )
+
+
+# GET weekly leaderboard route handle
+# date: YYYY-MM-DD or latest, a date between publications gets the previous week
+# limit: top N players
+@api.route('/rankings/<string:ranking_date>', methods=['GET'])
+@cached_response(rankings_versions)
+def get_rankings(ranking_date):
+   try:
+      
+      # Gets and validates arguments
+      try:
+         limit = int(request.args.get('limit', current_app.config['RANKINGS_TOP_DEFAULT']))
+         requested_date = None if ranking_date == 'latest' else date.fromisoformat(ranking_date)
+      except ValueError as e:
+         return jsonify({
+            'status': 'error',
+            'message': f'Invalid arguments: {str(e)}'
+         }), 400
+      
+      if limit < 1 or limit > current_app.config['RANKINGS_TOP_MAX']:
+         limit = current_app.config['RANKINGS_TOP_DEFAULT']
+      
+      # Nearest publication, on ranking_date index:
+      # latest one on or before requested date, otherwise first one after it
+      week_query = db.session.query(func.max(Rankings.ranking_date))
+      if requested_date:
+         week_query = week_query.filter(Rankings.ranking_date <= requested_date)
+      week = week_query.scalar()
+      
+      if week is None and requested_date:
+         week = (
+            db.session.query(func.min(Rankings.ranking_date))
+            .filter(Rankings.ranking_date > requested_date)
+            .scalar()
+         )
+      
+      if week is None:
+         error_msg = f'No rankings found for {ranking_date}.'
+         print(error_msg)
+         return jsonify({
+            'status': 'error',
+            'message': error_msg
+         }), 404
+      
+      # Top players of the week, in index order
+      query = db.session.execute(
+         select(
+            Rankings.rank,
+            Rankings.points,
+            Rankings.player_id,
+            Players.name_first,
+            Players.name_last,
+            Players.country
+         )
+         .outerjoin(Players, Players.player_id == Rankings.player_id)
+         .where(Rankings.ranking_date == week, Rankings.rank.isnot(None))
+         .order_by(Rankings.rank)
+         .limit(limit)
+      )
+      
+      rankings = [
+         {
+            'rank': rank,
+            'points': points if points is not None else '-',
+            'player_id': player_id,
+            'name_first': name_first,
+            'name_last': name_last,
+            'country': to_alpha2(country) or 'unknown'
+         }
+         for rank, points, player_id, name_first, name_last, country in query
+      ]
+      
+      response_object = {
+         'status': 'success',
+         'message': f'Rankings of {week.isoformat()} have been retrieved successfully!',
+         'ranking_date': week.strftime('%d-%m-%Y'),
+         'rankings': rankings
+      }
+      
+      # Past weeks never change, dates after latest week will get next week
+      latest_week = week if requested_date is None else \
+         db.session.query(func.max(Rankings.ranking_date)).scalar()
+      max_age = current_app.config['RANKINGS_LATEST_MAX_AGE'] if week == latest_week \
+         else current_app.config['RANKINGS_CACHE_MAX_AGE']
+      
+      response = jsonify(response_object)
+      response.headers['Cache-Control'] = f'public, max-age={max_age}'
+      return response, 200
+   
+   except Exception as e:
+      error_msg = f'Error retrieving rankings of {ranking_date}: {str(e)}'
+      current_app.logger.error(error_msg, exc_info=True)
+      
+      return jsonify({
+         'status': 'error',
+         'message': error_msg
+      }), 500
+
+
+# ----------------------------- APP FACTORY --------------------------------- #
+
+def init_database(app):
+   # Prepares the existing database for this version of the application
+   # Run once before serving, not by create_app: flask --app main init-database
+   global players_search_enabled
+   
+   # Creates missing tables (e.g. enrichment_jobs), columns and indexes
+   db.create_all()
+   added_columns = add_missing_columns()
+   for table in db.metadata.sorted_tables:
+      for index in table.indexes:
+         index.create(db.engine, checkfirst=True)
+   
+   players_search_enabled = app.config['PLAYERS_SEARCH_INDEX'] and setup_players_search()
+   
+   # Stores points as INTEGER, so every route returns numbers or '-' for unknown points
+   if not rankings_points_migrated():
+      total, unknown = migrate_rankings_points()
+      print(f'rankings.points migrated to INTEGER: {total} rankings, {unknown} unknown points set to NULL')
+   
+   # Fills best ranks once, when their columns have just been added to players
+   if 'best_rank' in added_columns.get('players', []):
+      refresh_player_best_ranks()
+      bump_versions(None)
+      db.session.commit()
+   
+   # Fills yearly summaries once, when player_year_rank is new or empty but rankings are not,
+   # otherwise every player would be served by the get_rank_by_year fallback
+   # Same values as the fallback, cached responses stay valid
+   if PlayerYearRank.query.first() is None and Rankings.query.first() is not None:
+      refresh_player_year_ranks()
+      db.session.commit()
+   
+   # Counters read by GET requests, which cannot store them
+   # Players are recounted, they may have been loaded outside the API
+   refresh_players_count()
+   db.session.commit()
+
+
+# Creates or upgrades the database: flask --app main init-database
+# gunicorn.conf.py runs it once in the master, before workers start
+@api.cli.command('init-database')
+def init_database_command():
+   start_time = time.monotonic()
+   init_database(current_app._get_current_object())
+   click.echo(f'Database ready in {time.monotonic() - start_time:.1f}s')
+
+
+def sqlite_read_only_uri(uri):
+   # URI of a SQLite database file opened read-only, None for other databases
+   url = make_url(uri)
+   if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:') \
+         or url.query.get('uri'):
+      return None
+   url = url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'})
+   return url.render_as_string(hide_password=False)
+
+
+def execute_pragmas(dbapi_connection, connection_record, pragmas=()):
+   cursor = dbapi_connection.cursor()
+   for pragma in pragmas:
+      cursor.execute(f'PRAGMA {pragma}')
+   cursor.close()
+
+
+def configure_sqlite(app):
+   # Pragmas of every new SQLite connection
+   for bind_key, engine in db.engines.items():
+      if engine.dialect.name != 'sqlite':
+         continue
+      
+      pragmas = [f"busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT'])}"]
+      if bind_key != 'readonly':
+         pragmas += [
+            f"journal_mode = {app.config['SQLITE_JOURNAL_MODE']}",
+            f"synchronous = {app.config['SQLITE_SYNCHRONOUS']}"
+         ]
+      event.listen(engine, 'connect', functools.partial(execute_pragmas, pragmas=pragmas))
+
+
+def create_app(config=None):
+   # Builds the application, found by flask --app main and gunicorn (gunicorn.conf.py)
+   # config: settings overriding the defaults, e.g. SQLALCHEMY_DATABASE_URI
+   # Does not open the database, init_database prepares it
+   global players_search_enabled
+   
+   # instanciates a Flask application
+   app = Flask(__name__)
+   configure(app)
+   if config:
+      app.config.update(config)
+   
+   # enables CORS, the route and leave it open to other origins
+   CORS(app, resources={r"/*":{'origins':"*"}})
+   
+   # second engine on the same SQLite file for GET requests
+   read_only_uri = app.config['SQLITE_READ_ONLY_GETS'] and \
+      sqlite_read_only_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+   if read_only_uri:
+      app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), 'readonly': read_only_uri}
+   
+   db.init_app(app)
+   configure_caches(app)
+   app.register_blueprint(api)
+   
+   with app.app_context():
+      configure_sqlite(app)
+   
+   # Checked again against this application database
+   players_search_enabled = None
+   
+   return app
+
+
 if __name__ == "__main__":
-   app.run(debug=True) #development mode
-   
\ No newline at end of file
+   app = create_app()
+   with app.app_context():
+      init_database(app)
+   
+   # Starts the worker only in the reloader child that serves requests
+   if app.config['ENRICHMENT_WORKER_ENABLED'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+      start_enrichment_worker(app)
+   app.run(debug=True) #development mode, production: gunicorn -c gunicorn.conf.py
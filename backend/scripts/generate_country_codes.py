@@ -0,0 +1,85 @@
+import os
+
+import pycountry
+
+# Generates Services/country_codes.py, the country codes translation table used at runtime,
+# so the app does not load pycountry databases nor search them for every player
+# Run again when pycountry is upgraded:
+#
+#   python scripts/generate_country_codes.py
+
+OUTPUT_PATH = os.path.join(
+   os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Services', 'country_codes.py'
+)
+
+# IOC codes used in ATP data that are not the ISO 3166-1 alpha-3 code of the country
+IOC_TO_ALPHA3 = {
+   'ALG': 'DZA', 'ANG': 'AGO', 'ANT': 'ATG', 'ARU': 'ABW', 'BAH': 'BHS', 'BAN': 'BGD',
+   'BAR': 'BRB', 'BER': 'BMU', 'BHU': 'BTN', 'BIZ': 'BLZ', 'BOT': 'BWA', 'BRU': 'BRN',
+   'BUL': 'BGR', 'BUR': 'BFA', 'CAM': 'KHM', 'CAY': 'CYM', 'CGO': 'COG', 'CHA': 'TCD',
+   'CHI': 'CHL', 'CRC': 'CRI', 'CRO': 'HRV', 'DEN': 'DNK', 'ESA': 'SLV', 'FIJ': 'FJI',
+   'GAM': 'GMB', 'GEQ': 'GNQ', 'GER': 'DEU', 'GRE': 'GRC', 'GRN': 'GRD', 'GUA': 'GTM',
+   'GUI': 'GIN', 'HAI': 'HTI', 'HON': 'HND', 'INA': 'IDN', 'IRI': 'IRN', 'ISV': 'VIR',
+   'IVB': 'VGB', 'KSA': 'SAU', 'KUW': 'KWT', 'LAT': 'LVA', 'LBA': 'LBY', 'LES': 'LSO',
+   'LIB': 'LBN', 'MAD': 'MDG', 'MAS': 'MYS', 'MAW': 'MWI', 'MGL': 'MNG', 'MON': 'MCO',
+   'MRI': 'MUS', 'MTN': 'MRT', 'MYA': 'MMR', 'NCA': 'NIC', 'NED': 'NLD', 'NEP': 'NPL',
+   'NGR': 'NGA', 'NIG': 'NER', 'OMA': 'OMN', 'PAR': 'PRY', 'PHI': 'PHL', 'PLE': 'PSE',
+   'POR': 'PRT', 'PUR': 'PRI', 'RSA': 'ZAF', 'SAM': 'WSM', 'SEY': 'SYC', 'SIN': 'SGP',
+   'SKN': 'KNA', 'SLO': 'SVN', 'SOL': 'SLB', 'SRI': 'LKA', 'SUD': 'SDN', 'SUI': 'CHE',
+   'TAN': 'TZA', 'TGA': 'TON', 'TOG': 'TGO', 'TPE': 'TWN', 'UAE': 'ARE', 'URU': 'URY',
+   'VAN': 'VUT', 'VIE': 'VNM', 'VIN': 'VCT', 'ZAM': 'ZMB', 'ZIM': 'ZWE'
+}
+
+TEMPLATE = '''# Generated by scripts/generate_country_codes.py from pycountry {version}, do not edit
+
+# ISO 3166-1 alpha-3 to alpha-2
+ALPHA3_TO_ALPHA2 = {alpha3}
+
+# IOC codes differing from ISO alpha-3 (as used in ATP data) to ISO alpha-2
+IOC_TO_ALPHA2 = {ioc}
+
+
+def to_alpha2(code):
+   # ISO alpha-2, ISO alpha-3 or IOC code, in any case, to lowercase alpha-2
+   # Two-letter codes are kept as they are, including user-assigned ones
+   # returned by Wikidata (e.g. XK for Kosovo)
+   # Returns None when code is unknown
+   if not code:
+      return None
+   code = code.strip().upper()
+   if len(code) == 2:
+      return code.lower() if code.isascii() and code.isalpha() else None
+   alpha2 = IOC_TO_ALPHA2.get(code) or ALPHA3_TO_ALPHA2.get(code)
+   return alpha2.lower() if alpha2 else None
+'''
+
+
+def format_codes(codes, per_line=8):
+   # Dict literal, a few codes per line
+   items = [f"'{key}': '{value}'" for key, value in sorted(codes.items())]
+   lines = [', '.join(items[start:start + per_line]) for start in range(0, len(items), per_line)]
+   return '{\n   ' + ',\n   '.join(lines) + '\n}'
+
+
+def main():
+   alpha3_to_alpha2 = {country.alpha_3: country.alpha_2 for country in pycountry.countries}
+
+   ioc_to_alpha2 = {}
+   for ioc, alpha3 in IOC_TO_ALPHA3.items():
+      # IOC code must not be the ISO code of another country
+      if ioc in alpha3_to_alpha2:
+         raise ValueError(f'IOC code {ioc} is also ISO alpha-3 of {alpha3_to_alpha2[ioc]}')
+      ioc_to_alpha2[ioc] = alpha3_to_alpha2[alpha3]
+
+   with open(OUTPUT_PATH, 'w', encoding='utf-8') as output:
+      output.write(TEMPLATE.format(
+         version=getattr(pycountry, '__version__', ''),
+         alpha3=format_codes(alpha3_to_alpha2),
+         ioc=format_codes(ioc_to_alpha2)
+      ))
+
+   print(f'{OUTPUT_PATH}: {len(alpha3_to_alpha2)} ISO and {len(ioc_to_alpha2)} IOC codes')
+
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+from io import StringIO
+
+# Incremental loads of flask --app main import-rankings: new weeks only, and best
+# ranks merged with the stored ones, on a temporary database
+#
+#   python -m unittest discover -s tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+class IncrementalImportTest(unittest.TestCase):
+
+   def setUp(self):
+      self.folder = tempfile.mkdtemp()
+      self.app = main.create_app({
+         'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.folder, 'tennisdb.sqlite')}"
+      })
+      self.context = self.app.app_context()
+      self.context.push()
+      main.init_database(self.app)
+      
+      for player_id in ['101', '102', '103']:
+         main.db.session.add(main.Players(player_id=player_id, name_last=f'Player {player_id}'))
+      main.db.session.commit()
+      
+      # Best rank 5 on 2020-01-06 for every player
+      self.load('20200106,5,101,1000\n20200106,5,102,1000\n20200106,5,103,1000\n')
+
+   def tearDown(self):
+      main.db.session.remove()
+      for engine in main.db.engines.values():
+         engine.dispose()
+      self.context.pop()
+      shutil.rmtree(self.folder, ignore_errors=True)
+
+   def load(self, content, incremental=False):
+      path = os.path.join(self.folder, 'atp_rankings.csv')
+      with open(path, 'w', encoding='utf-8') as ranking_file:
+         ranking_file.write(content)
+      with redirect_stdout(StringIO()):
+         return main.import_rankings([path], incremental=incremental)
+
+   def best_ranks(self):
+      main.db.session.expire_all()
+      return {
+         player_object.player_id: (player_object.best_rank, player_object.best_rank_date, player_object.weeks_at_best)
+         for player_object in main.Players.query.all()
+      }
+
+   def test_best_rank_merge(self):
+      # Stored week is skipped: rank 1 of 2020-01-06 must not be loaded
+      total_rows, total_players = self.load(
+         '20200106,1,101,9000\n20200113,3,101,1200\n20200113,5,102,1000\n20200113,8,103,800\n',
+         incremental=True
+      )
+      self.assertEqual((total_rows, total_players), (3, 3))
+      self.assertEqual(main.latest_ranking_date(), '2020-01-13')
+      
+      incremental = self.best_ranks()
+      self.assertEqual(incremental, {
+         '101': (3, date(2020, 1, 13), 1),   # improves
+         '102': (5, date(2020, 1, 6), 2),    # ties, first date kept
+         '103': (5, date(2020, 1, 6), 1)     # worse, unchanged
+      })
+      
+      # Same as computing best ranks from the whole history
+      main.refresh_player_best_ranks()
+      main.db.session.commit()
+      self.assertEqual(self.best_ranks(), incremental)
+
+   def test_nothing_new(self):
+      self.assertEqual(self.load('20200106,1,101,9000\n', incremental=True), (0, 0))
+      self.assertEqual(self.best_ranks()['101'], (5, date(2020, 1, 6), 1))
+
+
+if __name__ == '__main__':
+   unittest.main()
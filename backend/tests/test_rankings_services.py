@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Rows of weekly rankings files read by flask --app main import-rankings
+#
+#   python -m unittest discover -s tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Services.rankings_services import iter_ranking_rows, parse_points
+
+
+class IterRankingRowsTest(unittest.TestCase):
+
+   def read_rows(self, content):
+      # Returns (rows, warnings printed) of a rankings file with content
+      with tempfile.TemporaryDirectory() as folder:
+         path = os.path.join(folder, 'atp_rankings.csv')
+         with open(path, 'w', encoding='utf-8') as ranking_file:
+            ranking_file.write(content)
+         output = StringIO()
+         with redirect_stdout(output):
+            rows = list(iter_ranking_rows(path))
+      return rows, output.getvalue()
+
+   def test_unknown_points_keep_the_row(self):
+      rows, warnings = self.read_rows('20210104,1,101,9000\n20210104,2,102,unknown\n20210104,3,103,\n')
+      self.assertEqual(rows, [
+         ('101', '2021-01-04', 9000, 1),
+         ('102', '2021-01-04', None, 2),
+         ('103', '2021-01-04', None, 3)
+      ])
+      self.assertEqual(warnings, '')
+
+   def test_line_numbers_without_header(self):
+      _, warnings = self.read_rows('20210104,1,101,9000\n20210104,x,102,10\n')
+      self.assertIn('line 2 skipped', warnings)
+
+   def test_line_numbers_with_header(self):
+      _, warnings = self.read_rows('ranking_date,rank,player,points\n20210104,1,101,9000\n20210104,x,102,10\n')
+      self.assertIn('line 3 skipped', warnings)
+
+   def test_points_as_integer_rule(self):
+      self.assertEqual(parse_points(' 8000 '), 8000)
+      for value in ['unknown', '', '8000.5', '007']:
+         self.assertIsNone(parse_points(value))
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Startup must not pay for the Wikidata stack: checks in fresh interpreters that
+# importing main, and building the app on a temporary database, leave LAZY_MODULES unloaded
+# and that building the app does not create a database, in its folder or the working one
+#
+#   python -m unittest discover -s tests
+
+BACKEND_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_PATH, 'benchmarks'))
+
+from bench_startup import CREATE_APP, LAZY_MODULES
+
+
+def loaded_lazy_modules(code, cwd):
+   # Runs code in a fresh interpreter, returns the lazy modules it loaded
+   env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_PATH, os.environ.get('PYTHONPATH')])))
+   result = subprocess.run(
+      [sys.executable, '-c', f'import sys; {code}; print(*[name for name in {LAZY_MODULES!r} if name in sys.modules])'],
+      cwd=cwd, env=env, capture_output=True, text=True, check=True
+   )
+   return result.stdout.splitlines()[-1].split() if result.stdout.strip() else []
+
+
+class StartupTest(unittest.TestCase):
+
+   def test_import_main_skips_lazy_modules(self):
+      with tempfile.TemporaryDirectory() as folder:
+         self.assertEqual(loaded_lazy_modules('import main', folder), [])
+
+   def test_create_app_skips_lazy_modules(self):
+      with tempfile.TemporaryDirectory() as folder:
+         code = 'import main; ' + CREATE_APP.format(path=os.path.join(folder, 'startup.sqlite'))
+         self.assertEqual(loaded_lazy_modules(code, folder), [])
+   
+   def test_create_app_leaves_database_alone(self):
+      # The database is created and upgraded by init-database, not by building the app
+      with tempfile.TemporaryDirectory() as folder:
+         code = 'import main; ' + CREATE_APP.format(path=os.path.join(folder, 'startup.sqlite'))
+         loaded_lazy_modules(f'{code}; main.create_app()', folder)
+         self.assertEqual(os.listdir(folder), [])
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -3,14 +3,17 @@ import { httpClient, httpClientWiki } from './httpClient';
 const playersEndpoint = '/players';
 const wikiEndpoint = '/w/api.php';
 
-export const getAllPlayers = async (page, perPage, lastNameToSearch = '') => {
-  const res = await httpClient.get(playersEndpoint, {
-    params: {
-      page: page, 
-      per_page: perPage,
-      search_name_last: lastNameToSearch
-    }
-  });
+export const getAllPlayers = async (page, perPage, lastNameToSearch = '', cursor = null) => {
+  const params = {
+    page: page, 
+    per_page: perPage,
+    search_name_last: lastNameToSearch
+  };
+  // Cursor of previous page makes next page as fast as the first one
+  if (cursor) {
+    params.cursor = cursor;
+  }
+  const res = await httpClient.get(playersEndpoint, { params });
   return res.data;
 };
 
@@ -19,6 +22,31 @@ export const getPlayerById = async (id) => {
   return res.data;
 };
 
+// Ranking history, one point per week, month or year (resolution),
+// reduced to maxPoints chart points when given
+export const getPlayerRankings = async (id, { from = null, to = null, resolution = 'week', maxPoints = null } = {}) => {
+  const params = { resolution: resolution };
+  if (from) {
+    params.from = from;
+  }
+  if (to) {
+    params.to = to;
+  }
+  if (maxPoints) {
+    params.max_points = maxPoints;
+  }
+  const res = await httpClient.get(`${playersEndpoint}/${id}/rankings`, { params });
+  return res.data;
+};
+
+// Aligned ranking trajectories of several players (align: date, age or career),
+// one x array and one ranks array by player
+export const compareRankings = async (ids, align = 'date') => {
+  const params = { player_ids: ids.join(','), align: align };
+  const res = await httpClient.get('/rankings/compare', { params });
+  return res.data;
+};
+
 export const createPlayer = async (player) => {
   const res = await httpClient.post(playersEndpoint, player);
   return res.data;